@@ -0,0 +1,195 @@
+import functools
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.http import urlencode
+from recipes.config import IMAGE_PENDING, IMAGE_PROCESSING
+from rest_framework.response import Response
+
+HITS_KEY = 'recipes_cache:hits'
+MISSES_KEY = 'recipes_cache:misses'
+# Параметры, с которыми список рецептов зависит от счётчиков
+# избранного и корзин (версия 'counters').
+COUNTER_PARAMS = ('ordering', 'min_favorites')
+
+
+def get_cache():
+    '''Кэш ответов, настраивается через RECIPES_CACHE_ALIAS.'''
+    return caches[settings.RECIPES_CACHE_ALIAS]
+
+
+def _version_key(name):
+    return f'recipes_cache:version:{name}'
+
+
+def get_versions(*names):
+    '''
+    Текущие версии именованных областей кэша.
+    Отсутствующая версия создаётся из текущего времени, чтобы после
+    вытеснения ключа не совпасть со старой версией и не отдать
+    устаревшие записи.
+    '''
+    cache = get_cache()
+    keys = [_version_key(name) for name in names]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(*names):
+    '''Инвалидирует все записи, зависящие от указанных областей.'''
+    cache = get_cache()
+    for name in names:
+        key = _version_key(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+class ProcessSnapshot:
+    '''
+    Данные из БД, которые хранятся в памяти процесса. build() вызывается
+    заново, когда меняется версия name в кэше (её повышают сигналы
+    из api.signals), и не реже, чем раз в ttl секунд: с кэшем в памяти
+    процесса изменения из других процессов видны только так.
+    '''
+
+    def __init__(self, name, build, ttl):
+        self.name = name
+        self.build = build
+        self.ttl = ttl
+        self.data = None
+        self.version = None
+        self.built = 0
+        self.lock = threading.Lock()
+
+    def get(self):
+        version = get_versions(self.name)[0]
+        if (
+            self.data is None
+            or version != self.version
+            or time.monotonic() - self.built > self.ttl
+        ):
+            with self.lock:
+                self.data = self.build()
+                self.version = version
+                self.built = time.monotonic()
+        return self.data
+
+
+def _count(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+
+
+def get_stats():
+    '''Счётчики попаданий и промахов кэша ответов.'''
+    stats = get_cache().get_many((HITS_KEY, MISSES_KEY))
+    return {
+        'hits': stats.get(HITS_KEY, 0),
+        'misses': stats.get(MISSES_KEY, 0),
+    }
+
+
+def is_process_local():
+    '''
+    Кэш в памяти процесса (LocMemCache): счётчики и версии
+    не видны другим процессам, в том числе manage.py.
+    '''
+    return isinstance(get_cache(), LocMemCache)
+
+
+def _query_hash(request):
+    '''Хэш нормализованных (отсортированных) параметров запроса.'''
+    params = sorted(
+        (key, sorted(values)) for key, values in request.query_params.lists()
+    )
+    query = urlencode(params, doseq=True)
+    return hashlib.md5(query.encode()).hexdigest()
+
+
+def has_unfinished_images(data):
+    '''
+    В ответе есть рецепты, фото которых ещё не обработано. Воркер
+    process_images повышает версии в своём процессе, и с кэшем
+    в памяти процесса веб-процесс об этом не узнает, поэтому такие
+    ответы не кэшируются.
+    '''
+    recipes = data.get('results', [data])
+    return any(
+        recipe.get('image_status') in (IMAGE_PENDING, IMAGE_PROCESSING)
+        for recipe in recipes
+    )
+
+
+def cache_anonymous_response(view_method):
+    '''
+    Кэширует успешные GET-ответы анонимным пользователям.
+    Списки зависят от версий 'catalog' и 'recipes', а с сортировкой
+    или фильтром по счётчикам - ещё и от 'counters', отдельный
+    рецепт - от версий 'catalog', 'recipe:<id>' и 'author:<id>'
+    своего автора.
+    Версии повышаются сигналами из api.signals при изменении данных.
+    Ответы с необработанными фото не кэшируются.
+    '''
+
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        if request.method != 'GET' or not request.user.is_anonymous:
+            return view_method(view, request, *args, **kwargs)
+        cache = get_cache()
+        pk = kwargs.get(view.lookup_url_kwarg or view.lookup_field)
+        if pk is None:
+            names = ['catalog', 'recipes']
+            if any(param in request.query_params for param in COUNTER_PARAMS):
+                names.append('counters')
+            versions = ':'.join(str(version) for version in get_versions(
+                *names
+            ))
+            key = f'recipes_cache:list:{versions}'
+        else:
+            catalog, recipe = get_versions('catalog', f'recipe:{pk}')
+            key = f'recipes_cache:detail:{pk}:{catalog}:{recipe}'
+        key = f'{key}:{_query_hash(request)}'
+
+        entry = cache.get(key)
+        if entry is not None:
+            author_id, author_version, data = entry
+            if (
+                author_id is None
+                or get_versions(f'author:{author_id}')[0] == author_version
+            ):
+                _count(HITS_KEY)
+                response = Response(data)
+                response['X-Cache'] = 'HIT'
+                return response
+
+        _count(MISSES_KEY)
+        response = view_method(view, request, *args, **kwargs)
+        if response.status_code == 200 and not has_unfinished_images(
+            response.data
+        ):
+            author_id = author_version = None
+            if pk is not None:
+                author_id = response.data['author']['id']
+                author_version = get_versions(f'author:{author_id}')[0]
+            cache.set(
+                key,
+                (author_id, author_version, response.data),
+                settings.RECIPES_CACHE_TIMEOUT,
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
@@ -0,0 +1,33 @@
+from recipes.models import Tag
+
+from .cache import ProcessSnapshot
+
+# Снимок перестраивается не реже, чем раз в CATALOG_TTL секунд,
+# даже если сигнал об изменении тегов пришёл в другой процесс.
+CATALOG_TTL = 60
+
+
+class TagCatalog:
+    '''Неизменяемый снимок всех тегов.'''
+
+    def __init__(self, tags):
+        self.tags = list(tags)
+        self.by_id = {tag.id: tag for tag in self.tags}
+        self.by_slug = {tag.slug: tag for tag in self.tags}
+
+
+def build_catalog():
+    return TagCatalog(Tag.objects.all())
+
+
+_catalog = ProcessSnapshot('tags', build_catalog, CATALOG_TTL)
+
+
+def get_tag_catalog():
+    '''
+    Теги из памяти процесса.
+    Снимок перестраивается, когда меняется версия 'tags' в кэше
+    (её повышает сигнал об изменении тегов в api.signals),
+    или по истечении CATALOG_TTL.
+    '''
+    return _catalog.get()
@@ -0,0 +1,117 @@
+import functools
+import hashlib
+import logging
+
+from django.conf import settings
+from django.db import connection
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetError(Exception):
+    '''Вьюха выполнила больше запросов к БД, чем ей разрешено.'''
+
+
+class QueryBudget:
+    '''
+    Контекст, который считает запросы к БД, проходящие через
+    execute_wrapper, и при выходе без исключения сравнивает их число
+    с max_queries. При превышении пишет предупреждение в лог,
+    а если в настройках включен QUERY_BUDGET_RAISE (например,
+    в тестах), выбрасывает QueryBudgetError.
+    '''
+
+    def __init__(self, name, max_queries):
+        self.name = name
+        self.max_queries = max_queries
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.wrapper = connection.execute_wrapper(self)
+        self.wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.wrapper.__exit__(exc_type, exc_value, traceback)
+        if exc_type is None:
+            self.check()
+
+    def check(self):
+        if self.count > self.max_queries:
+            message = (
+                f'{self.name}: {self.count} запросов к БД '
+                f'при лимите {self.max_queries}'
+            )
+            if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+                raise QueryBudgetError(message)
+            logger.warning(message)
+
+
+def query_budget(max_queries):
+    '''
+    Ограничивает число запросов к БД, которые может выполнить
+    метод вьюсета (см. QueryBudget).
+    '''
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            name = f'{type(view).__name__}.{view_method.__name__}'
+            with QueryBudget(name, max_queries):
+                return view_method(view, request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def budgeted_stream(name, max_queries, chunks):
+    '''
+    Отдаёт части потокового ответа, считая запросы к БД только пока
+    готовится очередная часть: генератор выполняется уже после
+    возврата из вьюхи, и query_budget его запросы не видит.
+    Лимит проверяется, когда поток прочитан до конца.
+    '''
+    budget = QueryBudget(name, max_queries)
+    chunks = iter(chunks)
+    while True:
+        with connection.execute_wrapper(budget):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        yield chunk
+    budget.check()
+
+
+def conditional(validators):
+    '''
+    Поддержка условных GET-запросов (If-None-Match).
+    validators(view, request, *args, **kwargs) возвращает строку,
+    однозначно описывающую ответ; её хэш отдаётся в ETag.
+    Если клиент уже получил такой ответ, возвращается 304 Not Modified
+    без сериализации. Last-Modified не отдаётся: по датам изменения
+    не видны удаления записей и состояние ответа для пользователя
+    (избранное, корзина, подписки), и ответ на одном If-Modified-Since
+    мог бы оказаться устаревшим.
+    '''
+
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_method(view, request, *args, **kwargs)
+            source = validators(view, request, *args, **kwargs)
+            etag = quote_etag(hashlib.md5(source.encode()).hexdigest())
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
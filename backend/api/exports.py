@@ -0,0 +1,89 @@
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import F
+from recipes.models import ShoppingListItem
+from recipes.units import merge_units
+
+from .pdf import load_font, write_pdf
+
+# Сколько строк за раз читается из серверного курсора.
+CHUNK_SIZE = 500
+
+
+def shopping_list_rows(user):
+    '''
+    Список покупок пользователя: ингредиенты с суммарным количеством
+    из таблицы, которая поддерживается при изменении Корзины
+    (см. recipes.shopping_list). Строки читаются порциями по CHUNK_SIZE,
+    количества одного ингредиента в "г" и "кг", "мл" и "л" суммируются.
+    '''
+    return merge_units(ShoppingListItem.objects.filter(user=user).values(
+        'amount',
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+    ).order_by('name', 'measurement_unit').iterator(chunk_size=CHUNK_SIZE))
+
+
+def title(user):
+    return f'Список покупок пользователя {user.username}'
+
+
+def line(row):
+    return f'{row["name"]}: {row["amount"]} {row["measurement_unit"]}'
+
+
+def write_txt(user, rows):
+    yield f'{title(user)}\n'
+    for row in rows:
+        yield f'{line(row)}\n'
+
+
+class Echo:
+    '''Псевдо-буфер: csv.writer возвращает строку вместо записи в файл.'''
+
+    def write(self, value):
+        return value
+
+
+def write_csv(user, rows):
+    writer = csv.writer(Echo())
+    # BOM нужен, чтобы Excel распознал UTF-8.
+    yield '\ufeff' + writer.writerow(('name', 'amount', 'measurement_unit'))
+    for row in rows:
+        yield writer.writerow(
+            (row['name'], row['amount'], row['measurement_unit'])
+        )
+
+
+def write_json(user, rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        item = {
+            'name': row['name'],
+            'amount': row['amount'],
+            'measurement_unit': row['measurement_unit'],
+        }
+        yield separator + json.dumps(item, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+def write_pdf_list(user, rows):
+    '''
+    Шрифт загружается сразу, а не при чтении потока:
+    ошибка из FONT_ERRORS возникает до начала ответа.
+    '''
+    font = load_font(settings.SHOPPING_LIST_PDF_FONT)
+    return write_pdf(title(user), (line(row) for row in rows), font)
+
+
+# Формат выгрузки: (генератор, content type, расширение файла).
+WRITERS = {
+    'txt': (write_txt, 'text/plain; charset=utf-8', 'txt'),
+    'csv': (write_csv, 'text/csv; charset=utf-8', 'csv'),
+    'json': (write_json, 'application/json', 'json'),
+    'pdf': (write_pdf_list, 'application/pdf', 'pdf'),
+}
@@ -1,25 +1,96 @@
+from django.db import connections
+from django.db.models.expressions import RawSQL
 from django_filters.rest_framework import FilterSet, filters
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe, TagRecipe
+from rest_framework.filters import BaseFilterBackend
+
+from .catalog import get_tag_catalog
+from .search import get_ingredient_index
+
+
+def tag_choices():
+    '''Варианты фильтра по тегам: слаги из памяти процесса.'''
+    return [(tag.slug, tag.name) for tag in get_tag_catalog().tags]
+
+
+def order_by_ids(queryset, ids):
+    '''
+    Сортирует queryset в порядке ids одним CASE по первичному ключу.
+    Выражение собирается как RawSQL: Case из сотни When компилируется
+    ORM в несколько раз дольше, чем выполняется сам запрос.
+    '''
+    quote = connections[queryset.db].ops.quote_name
+    meta = queryset.model._meta
+    column = f'{quote(meta.db_table)}.{quote(meta.pk.column)}'
+    return queryset.filter(pk__in=ids).order_by(RawSQL(
+        f'CASE {column} ' + ' '.join(['WHEN %s THEN %s'] * len(ids))
+        + ' END',
+        [value for position, pk in enumerate(ids) for value in (pk, position)],
+    ))
+
+
+class IngredientSearchFilter(BaseFilterBackend):
+    '''
+    Автодополнение ингредиентов по параметру ?name= (или ?search=)
+    через индекс в памяти процесса вместо icontains по всей таблице.
+    '''
+
+    def filter_queryset(self, request, queryset, view):
+        query = (
+            request.query_params.get('name')
+            or request.query_params.get('search')
+        )
+        if not query:
+            return queryset
+        ids = get_ingredient_index().search(query)
+        if not ids:
+            return queryset.none()
+        return order_by_ids(queryset, ids)
 
 
 class RecipeFilter(FilterSet):
     '''
     Фильтрация по избранному, автору, списку покупок и тегам.
+    Сортировка и фильтрация по счётчикам избранного и списков покупок.
+    Автор фильтруется по id без загрузки пользователя, теги - по снимку
+    из памяти процесса, так что фильтры не добавляют запросов к БД
+    (кроме перестройки снимка тегов).
     '''
 
+    author = filters.NumberFilter(field_name='author_id')
     is_favorited = filters.BooleanFilter(method='get_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='get_tags',
+    )
+    min_favorites = filters.NumberFilter(
+        field_name='favorites_count', lookup_expr='gte'
+    )
+    ordering = filters.OrderingFilter(
+        fields=('pub_date', 'favorites_count', 'carts_count')
     )
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('tags', 'is_favorited', 'is_in_shopping_cart')
+
+    def get_tags(self, queryset, name, value):
+        '''
+        Рецепты хотя бы с одним из тегов.
+        Слаги проверяются по тегам из памяти процесса, без запроса к БД.
+        '''
+        if not value:
+            return queryset
+        catalog = get_tag_catalog()
+        tags = [catalog.by_slug[slug].id for slug in value]
+        return queryset.filter(
+            pk__in=TagRecipe.objects.filter(
+                tag__in=tags
+            ).values('recipe_id')
+        )
 
     def get_is_favorited(self, queryset, name, value):
         '''Показывает только рецепты, находящиеся в списке Избранного.'''
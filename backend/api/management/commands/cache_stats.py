@@ -0,0 +1,29 @@
+from api.cache import get_stats, is_process_local
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    '''
+    Показывает счётчики кэша ответов для анонимных пользователей.
+    Счётчики хранятся в самом кэше, поэтому команда видит их только
+    при общем бэкенде (memcached, redis). С LocMemCache счётчики
+    каждого процесса отдаёт вьюха /api/cache_stats/ (для staff).
+    '''
+
+    help = 'show hit/miss counters of the anonymous response cache'
+
+    def handle(self, *args, **options):
+        if is_process_local():
+            self.stderr.write(self.style.WARNING(
+                'Кэш в памяти процесса (LocMemCache): счётчики веб-процессов '
+                'отсюда не видны, используйте /api/cache_stats/ '
+                'или общий CACHE_BACKEND.'
+            ))
+        stats = get_stats()
+        total = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / total if total else 0
+        self.stdout.write(
+            f'hits: {stats["hits"]}\n'
+            f'misses: {stats["misses"]}\n'
+            f'hit ratio: {ratio:.2%}'
+        )
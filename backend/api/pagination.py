@@ -1,5 +1,226 @@
-from rest_framework.pagination import PageNumberPagination
+import json
 
+from django.core.paginator import EmptyPage, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (CursorPagination, LimitOffsetPagination,
+                                       PageNumberPagination)
+
+
+def estimate_count(queryset):
+    '''
+    Оценка числа строк запроса по статистике планировщика PostgreSQL.
+    Для других СУБД возвращает None.
+    '''
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def approximate_count(queryset, threshold):
+    '''
+    Возвращает пару (количество, приблизительное ли оно).
+    Сначала строки считаются точно, но не больше threshold + 1
+    (COUNT(*) по подзапросу с LIMIT). Если строк больше threshold,
+    возвращается оценка планировщика, но не меньше этого предела.
+    Без оценки (не PostgreSQL) считается полный COUNT(*).
+    '''
+    count = queryset.order_by()[:threshold + 1].count()
+    if count <= threshold:
+        return count, False
+    estimate = estimate_count(queryset)
+    if estimate is None:
+        return queryset.count(), False
+    return max(estimate, count), True
+
+
+class ApproximateCountPaginator(Paginator):
+    '''
+    Django-пагинатор, который на больших выборках не считает COUNT(*).
+    Оценка может оказаться меньше настоящего числа строк, поэтому
+    при приблизительном подсчёте страницы за ней не отбрасываются.
+    '''
+
+    threshold = 10000
+    count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        count, self.count_is_approximate = approximate_count(
+            self.object_list, self.threshold
+        )
+        return count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.count_is_approximate or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if not self.count_is_approximate and top + self.orphans >= self.count:
+            top = self.count
+        return self._get_page(self.object_list[bottom:top], number, self)
+
+
+class ApproximateCountMixin:
+    '''
+    Добавляет в ответ флаг count_is_approximate.
+    Точный подсчёт сохраняется для выборок меньше
+    approximate_count_threshold строк.
+    '''
+
+    approximate_count_threshold = ApproximateCountPaginator.threshold
+    count_is_approximate = False
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data['count_is_approximate'] = self.count_is_approximate
+        return response
+
+
+class StandardResultsSetPagination(ApproximateCountMixin,
+                                   PageNumberPagination):
+    page_size = 6
+
+    def django_paginator_class(self, object_list, per_page):
+        paginator = ApproximateCountPaginator(object_list, per_page)
+        paginator.threshold = self.approximate_count_threshold
+        return paginator
+
+    def get_paginated_response(self, data):
+        self.count_is_approximate = getattr(
+            self.page.paginator, 'count_is_approximate', False
+        )
+        return super().get_paginated_response(data)
+
+
+class ApproximateLimitOffsetPagination(ApproximateCountMixin,
+                                       LimitOffsetPagination):
+    '''LimitOffsetPagination с приблизительным подсчётом больших выборок.'''
+
+    def get_count(self, queryset):
+        count, self.count_is_approximate = approximate_count(
+            queryset, self.approximate_count_threshold
+        )
+        return count
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''
+    Курсорная (keyset) пагинация ленты рецептов по (pub_date, id).
+    Позиция курсора - пара (pub_date, id) рецепта на краю страницы,
+    следующая страница выбирается условием
+    pub_date < x OR (pub_date = x AND id < y), поэтому рецепты
+    с одинаковым pub_date не пропускаются и не повторяются.
+    Не считает COUNT(*) и не использует OFFSET,
+    поэтому глубокие страницы загружаются так же быстро, как первая.
+    '''
+
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-pub_date', '-id')
+
+    def _get_position_from_instance(self, instance, ordering):
+        return f'{instance.pub_date.isoformat()}|{instance.pk}'
+
+    def get_position_filter(self, position, reverse):
+        '''Условие на рецепты после позиции (до неё - для reverse).'''
+        published, separator, pk = position.rpartition('|')
+        try:
+            published, pk = parse_datetime(published), int(pk)
+        except ValueError:
+            published = None
+        if published is None:
+            raise NotFound(self.invalid_cursor_message)
+        lookup = 'gt' if reverse else 'lt'
+        return Q(**{f'pub_date__{lookup}': published}) | Q(
+            pub_date=published, **{f'id__{lookup}': pk}
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        '''
+        То же, что CursorPagination.paginate_queryset, но позиция
+        фильтруется по паре (pub_date, id). Позиции уникальны, поэтому
+        ссылки на соседние страницы всегда строятся без смещения.
+        '''
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+        queryset = queryset.order_by(
+            *(('pub_date', 'id') if reverse else self.ordering)
+        )
+        if current_position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(current_position, reverse)
+            )
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering
+            )
+        has_current = current_position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = (
+                has_current, following_position is not None
+            )
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next, self.has_previous = (
+                following_position is not None, has_current
+            )
+            self.next_position = following_position
+            self.previous_position = current_position
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+
+class SubscriptionPagination(StandardResultsSetPagination):
+    '''Постраничная пагинация подписок, размер страницы - ?limit='''
+
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    '''
+    Курсорная пагинация подписок: от новых подписок к старым.
+    Позиция - id записи Subscribe, аннотированный как subscription_id.
+    '''
 
-class StandardResultsSetPagination(PageNumberPagination):
     page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = ('-subscription_id',)
+
+    def get_ordering(self, request, queryset, view):
+        '''Порядок фиксирован, OrderingFilter вьюсета не применяется.'''
+        return self.ordering
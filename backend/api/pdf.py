@@ -0,0 +1,252 @@
+import zlib
+from functools import lru_cache
+from io import BytesIO
+from itertools import chain
+
+from fontTools import subset
+from fontTools.ttLib import TTFont, TTLibError
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 11
+LINE_HEIGHT = 16
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+# Имя встроенного подмножества шрифта: шесть заглавных букв и "+".
+FONT_NAME = 'FGLIST+ShoppingListFont'
+# Ошибки загрузки шрифта: нет файла, не TrueType или нет нужных таблиц.
+FONT_ERRORS = (OSError, TTLibError, KeyError)
+
+
+class TrueTypeFont:
+    '''
+    TrueType-шрифт для PDF (разбирается fontTools): соответствие символов
+    глифам, ширины глифов, метрики для дескриптора шрифта
+    и подмножество шрифта только с использованными глифами.
+    '''
+
+    def __init__(self, path):
+        with open(path, 'rb') as font_file:
+            self.data = font_file.read()
+        font = TTFont(BytesIO(self.data))
+        cmap = font.getBestCmap()
+        if not cmap:
+            raise TTLibError('В шрифте нет таблицы cmap для Unicode.')
+        self.glyph_ids = {
+            code: font.getGlyphID(name) for code, name in cmap.items()
+        }
+        head, hhea = font['head'], font['hhea']
+        self.units_per_em = head.unitsPerEm
+        self.bbox = [
+            self.scale(value)
+            for value in (head.xMin, head.yMin, head.xMax, head.yMax)
+        ]
+        self.ascent, self.descent = (
+            self.scale(hhea.ascent), self.scale(hhea.descent)
+        )
+        metrics = font['hmtx'].metrics
+        self.advances = [metrics[name][0] for name in font.getGlyphOrder()]
+
+    def scale(self, value):
+        return round(value * 1000 / self.units_per_em)
+
+    def glyph(self, char):
+        '''Номер глифа для символа (0, если символа нет в шрифте).'''
+        return self.glyph_ids.get(ord(char), 0)
+
+    def width(self, glyph):
+        return self.scale(self.advances[glyph])
+
+    def subset(self, glyphs):
+        '''
+        Файл шрифта только с глифами glyphs. Номера глифов сохраняются,
+        поэтому уже записанные страницы на них и ссылаются.
+        '''
+        options = subset.Options()
+        options.retain_gids = True
+        options.notdef_outline = True
+        options.layout_features = []
+        # Служебная таблица FontForge, fontTools её не поддерживает.
+        options.drop_tables.append('FFTM')
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(gids=glyphs)
+        font = TTFont(BytesIO(self.data))
+        subsetter.subset(font)
+        buffer = BytesIO()
+        font.save(buffer)
+        return buffer.getvalue()
+
+    def wrap(self, text, max_width):
+        '''Разбивает строку по словам, чтобы она помещалась в max_width.'''
+        lines, line, line_width = [], [], 0
+        space = self.width(self.glyph(' '))
+        for word in text.split(' '):
+            width = sum(self.width(self.glyph(char)) for char in word)
+            if line and line_width + space + width > max_width:
+                lines.append(' '.join(line))
+                line, line_width = [], 0
+            line_width += width + (space if line else 0)
+            line.append(word)
+        lines.append(' '.join(line))
+        return lines
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    '''
+    Шрифт разбирается один раз на процесс.
+    Если его нельзя загрузить, выбрасывается одна из FONT_ERRORS.
+    '''
+    return TrueTypeFont(path)
+
+
+def write_pdf(title, lines, font):
+    '''
+    Потоково формирует PDF: страницы отдаются по мере поступления строк,
+    а шрифт (только использованные глифы), дерево страниц и таблица
+    xref пишутся в конце. В памяти держится только текущая страница,
+    список смещений объектов и номера использованных глифов.
+    font загружается заранее (load_font), чтобы ошибка шрифта
+    обнаружилась до начала ответа.
+    '''
+    used_glyphs = {}
+    offsets = {}
+    position = 0
+    # Номера 1-7 зарезервированы под каталог, дерево страниц и шрифт.
+    catalog, pages, type0, cid_font, descriptor, font_file, to_unicode = range(
+        1, 8
+    )
+    next_number = 8
+    kids = []
+
+    def obj(number, body, stream=None):
+        nonlocal position
+        offsets[number] = position
+        chunk = f'{number} 0 obj\n'.encode() + body
+        if stream is not None:
+            chunk += b'\nstream\n' + stream + b'\nendstream'
+        chunk += b'\nendobj\n'
+        position += len(chunk)
+        return chunk
+
+    def encode(text):
+        glyphs = []
+        for char in text:
+            glyph = font.glyph(char)
+            used_glyphs.setdefault(glyph, char)
+            glyphs.append(f'{glyph:04X}')
+        return ''.join(glyphs)
+
+    def page(page_lines):
+        nonlocal next_number
+        page_number, content_number = next_number, next_number + 1
+        next_number += 2
+        kids.append(page_number)
+        commands = [
+            f'BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL '
+            f'{MARGIN} {PAGE_HEIGHT - MARGIN} Td'
+        ]
+        commands.extend(f'<{encode(line)}> Tj T*' for line in page_lines)
+        commands.append('ET')
+        content = zlib.compress('\n'.join(commands).encode())
+        return obj(
+            page_number,
+            f'<< /Type /Page /Parent {pages} 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 {type0} 0 R >> >> '
+            f'/Contents {content_number} 0 R >>'.encode()
+        ) + obj(
+            content_number,
+            f'<< /Length {len(content)} /Filter /FlateDecode >>'.encode(),
+            content,
+        )
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position += len(header)
+    yield header
+
+    max_width = (PAGE_WIDTH - 2 * MARGIN) * 1000 / FONT_SIZE
+    page_lines = []
+    for line in chain((title, ''), lines):
+        for part in font.wrap(line, max_width):
+            page_lines.append(part)
+            if len(page_lines) == LINES_PER_PAGE:
+                yield page(page_lines)
+                page_lines = []
+    if page_lines or not kids:
+        yield page(page_lines)
+
+    widths = ' '.join(
+        f'{glyph} [{font.width(glyph)}]' for glyph in sorted(used_glyphs)
+    )
+    # В одном блоке bfchar допускается не больше 100 записей.
+    mapping = [
+        f'<{glyph:04X}> <{ord(char):04X}>'
+        for glyph, char in sorted(used_glyphs.items())
+        if ord(char) <= 0xFFFF
+    ]
+    cmap = '\n'.join(
+        f'{len(block)} beginbfchar\n' + '\n'.join(block) + '\nendbfchar'
+        for block in (
+            mapping[i:i + 100] for i in range(0, len(mapping), 100)
+        )
+    )
+    cmap_stream = (
+        '/CIDInit /ProcSet findresource begin 12 dict begin begincmap '
+        '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+        '/Supplement 0 >> def /CMapName /Adobe-Identity-UCS def '
+        '/CMapType 2 def 1 begincodespacerange <0000> <FFFF> '
+        f'endcodespacerange\n{cmap}\n'
+        'endcmap CMapName currentdict /CMap defineresource pop end end'
+    ).encode()
+    yield obj(catalog, f'<< /Type /Catalog /Pages {pages} 0 R >>'.encode())
+    yield obj(
+        pages,
+        f'<< /Type /Pages /Kids [{" ".join(f"{kid} 0 R" for kid in kids)}] '
+        f'/Count {len(kids)} >>'.encode()
+    )
+    yield obj(
+        type0,
+        f'<< /Type /Font /Subtype /Type0 /BaseFont /{FONT_NAME} '
+        f'/Encoding /Identity-H /DescendantFonts [{cid_font} 0 R] '
+        f'/ToUnicode {to_unicode} 0 R >>'.encode()
+    )
+    yield obj(
+        cid_font,
+        f'<< /Type /Font /Subtype /CIDFontType2 /BaseFont /{FONT_NAME} '
+        f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+        f'/Supplement 0 >> /FontDescriptor {descriptor} 0 R '
+        f'/CIDToGIDMap /Identity /W [{widths}] >>'.encode()
+    )
+    yield obj(
+        descriptor,
+        f'<< /Type /FontDescriptor /FontName /{FONT_NAME} /Flags 32 '
+        f'/FontBBox [{" ".join(map(str, font.bbox))}] /ItalicAngle 0 '
+        f'/Ascent {font.ascent} /Descent {font.descent} '
+        f'/CapHeight {font.ascent} /StemV 80 '
+        f'/FontFile2 {font_file} 0 R >>'.encode()
+    )
+    font_data = font.subset(used_glyphs)
+    compressed = zlib.compress(font_data)
+    yield obj(
+        font_file,
+        f'<< /Length {len(compressed)} /Length1 {len(font_data)} '
+        f'/Filter /FlateDecode >>'.encode(),
+        compressed,
+    )
+    yield obj(
+        to_unicode,
+        f'<< /Length {len(cmap_stream)} >>'.encode(),
+        cmap_stream,
+    )
+
+    xref = [f'xref\n0 {next_number}\n0000000000 65535 f \n']
+    xref.extend(
+        f'{offsets[number]:010d} 00000 n \n'
+        for number in range(1, next_number)
+    )
+    xref.append(
+        f'trailer\n<< /Size {next_number} /Root {catalog} 0 R >>\n'
+        f'startxref\n{position}\n%%EOF\n'
+    )
+    yield ''.join(xref).encode()
@@ -0,0 +1,144 @@
+import bisect
+from collections import Counter, defaultdict
+
+from recipes.models import Ingredient
+
+from .cache import ProcessSnapshot
+
+# Сколько ингредиентов максимум отдаёт автодополнение.
+MAX_RESULTS = 100
+# Нечёткий поиск подключается, если точных совпадений меньше.
+FUZZY_MIN_RESULTS = 10
+# Индекс перестраивается не реже, чем раз в INDEX_TTL секунд,
+# даже если сигнал об изменении пришёл в другой процесс.
+INDEX_TTL = 5 * 60
+
+
+def normalize(text):
+    return text.lower().replace('ё', 'е').strip()
+
+
+def trigrams(word):
+    padded = f' {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def prefix_distance(query, word, limit):
+    '''
+    Наименьшее расстояние Дамерау-Левенштейна между запросом
+    и каким-либо началом слова. Если оно больше limit,
+    расчёт прерывается и возвращается limit + 1.
+    '''
+    word = word[:len(query) + limit]
+    before_previous_row = None
+    previous_row = None
+    row = list(range(len(word) + 1))
+    for i, query_char in enumerate(query, 1):
+        before_previous_row, previous_row = previous_row, row
+        row = [i] + [0] * len(word)
+        for j, word_char in enumerate(word, 1):
+            row[j] = min(
+                previous_row[j] + 1,
+                row[j - 1] + 1,
+                previous_row[j - 1] + (query_char != word_char),
+            )
+            if (
+                before_previous_row is not None and j > 1
+                and query_char == word[j - 2]
+                and query[i - 2] == word_char
+            ):
+                row[j] = min(row[j], before_previous_row[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return min(row)
+
+
+def allowed_typos(query):
+    if len(query) < 4:
+        return 0
+    if len(query) < 8:
+        return 1
+    return 2
+
+
+class IngredientIndex:
+    '''
+    Индекс ингредиентов в памяти процесса для автодополнения.
+    Сначала идут названия, начинающиеся с запроса, затем названия,
+    содержащие его, и, если их мало, названия со словами,
+    отличающимися от запроса на одну-две опечатки.
+    '''
+
+    def __init__(self, ingredients):
+        entries = sorted(
+            (normalize(name), pk) for pk, name in ingredients
+        )
+        self.names = [name for name, pk in entries]
+        self.ids = [pk for name, pk in entries]
+        self.word_ids = defaultdict(set)
+        self.trigram_words = defaultdict(set)
+        for name, pk in entries:
+            for word in name.split():
+                self.word_ids[word].add(pk)
+                for trigram in trigrams(word):
+                    self.trigram_words[trigram].add(word)
+
+    def search(self, query):
+        '''Возвращает id ингредиентов в порядке релевантности.'''
+        query = normalize(query)
+        if not query:
+            return []
+        start = bisect.bisect_left(self.names, query)
+        end = bisect.bisect_left(self.names, query + '\uffff', lo=start)
+        result = self.ids[start:end]
+        found = set(result)
+        if len(result) < MAX_RESULTS:
+            result.extend(
+                pk for name, pk in zip(self.names, self.ids)
+                if query in name and pk not in found
+            )
+            found.update(result)
+        if len(result) < FUZZY_MIN_RESULTS:
+            result.extend(
+                pk for pk in self.fuzzy_search(query) if pk not in found
+            )
+        return result[:MAX_RESULTS]
+
+    def fuzzy_search(self, query):
+        '''
+        Ищет слова, начало которых отличается от запроса не более
+        чем на allowed_typos(query) правок. Кандидаты отбираются
+        по общим триграммам, при равном числе правок выше те,
+        у которых общих триграмм больше.
+        '''
+        typos = allowed_typos(query)
+        if not typos or ' ' in query:
+            return []
+        shared = Counter()
+        for trigram in trigrams(query):
+            shared.update(self.trigram_words.get(trigram, ()))
+        scored = []
+        for word, common in shared.items():
+            distance = prefix_distance(query, word, typos)
+            if distance <= typos:
+                scored.append((distance, -common, word))
+        ranked = []
+        for distance, common, word in sorted(scored):
+            ranked.extend(sorted(self.word_ids[word]))
+        return ranked
+
+
+def build_index():
+    return IngredientIndex(Ingredient.objects.values_list('id', 'name'))
+
+
+_index = ProcessSnapshot('ingredients', build_index, INDEX_TTL)
+
+
+def get_ingredient_index():
+    '''
+    Индекс ингредиентов текущего процесса.
+    Перестраивается при смене версии 'ingredients' в кэше
+    (см. api.signals) или по истечении INDEX_TTL.
+    '''
+    return _index.get()
@@ -1,10 +1,77 @@
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                            ShoppingCart, Subscribe, Tag, TagRecipe)
+import imghdr
+from collections import defaultdict
+
+from django.db import connections, models, transaction
+from django.db.models import prefetch_related_objects
+from drf_extra_fields.fields import Base64FileField
+from recipes.models import (Ingredient, IngredientAmount, Recipe, Subscribe,
+                            Tag, TagRecipe, ingredient_amounts_prefetch)
+from recipes.shopping_list import apply_deltas, recipe_deltas
+from recipes.storage import image_storage
 from rest_framework import serializers
 from rest_framework.serializers import ValidationError
 from users.models import User
 
+from .catalog import get_tag_catalog
+
+# Сколько рецептов можно передать в одном массовом запросе.
+MAX_BULK_RECIPES = 100
+# Сколько рецептов автора выводится в подписках: по умолчанию и наибольшее.
+RECIPES_LIMIT = 3
+MAX_RECIPES_LIMIT = 50
+
+
+def get_recipes_limit(request):
+    '''
+    Параметр recipes_limit запроса: по умолчанию RECIPES_LIMIT,
+    значения больше MAX_RECIPES_LIMIT уменьшаются до него.
+    '''
+    value = request.query_params.get('recipes_limit') if request else None
+    if value in (None, ''):
+        return RECIPES_LIMIT
+    if not value.isdecimal():
+        raise ValidationError(
+            {'recipes_limit': 'Укажите целое неотрицательное число.'}
+        )
+    return min(int(value), MAX_RECIPES_LIMIT)
+
+
+def delete_rows(model, pks):
+    '''
+    Удаляет записи model по id одним DELETE, без загрузки записей
+    и без сигналов: вызывающий сам обновляет зависящие от них данные.
+    '''
+    pks = list(pks)
+    if not pks:
+        return
+    connection = connections[model.objects.db]
+    quote = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} IN ({placeholders})',
+            pks,
+        )
+
+
+class CachedTagField(serializers.PrimaryKeyRelatedField):
+    '''
+    Поле тега по id, которое находит тег в памяти процесса
+    (api.catalog) вместо запроса к БД.
+    '''
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            tag = get_tag_catalog().by_id.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if tag is None:
+            self.fail('does_not_exist', pk_value=data)
+        return tag
+
 
 class TagSerializer(serializers.ModelSerializer):
     '''Сериализатор для тегов с валидацией hex цвета'''
@@ -41,13 +108,36 @@ class IngredientSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = '__all__'
+        fields = ('id', 'name', 'measurement_unit')
         read_only_fields = '__all__',
 
 
+class SubscriptionsListSerializer(serializers.ListSerializer):
+    '''
+    Список, который одним запросом находит подписки текущего пользователя
+    на всех авторов страницы и передаёт их вложенным сериализаторам
+    через context['subscriptions'].
+    '''
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.Manager) else data)
+        user = self.context.get('request').user
+        if user.is_authenticated:
+            author_field = self.child.subscription_author_field
+            authors = {getattr(item, author_field) for item in items}
+            self.context['subscriptions'] = set(
+                Subscribe.objects.filter(
+                    user=user, author__in=authors
+                ).values_list('author_id', flat=True)
+            )
+        return super().to_representation(items)
+
+
 class UserSerializer(serializers.ModelSerializer):
     '''Сериализатор пользователей.'''
 
+    subscription_author_field = 'id'
+
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -63,6 +153,7 @@ class UserSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ('is_subscribed',)
         extra_kwargs = {'password': {'write_only': True}}
+        list_serializer_class = SubscriptionsListSerializer
 
     def create(self, validated_data):
         '''Создание, проверка и установка пароля пользователя.'''
@@ -80,11 +171,16 @@ class UserSerializer(serializers.ModelSerializer):
         '''
         Проверка подписки на конкретного пользователя.
         В зависимости от результата возвращает True или False.
+        Для списков использует подписки, загруженные заранее
+        в SubscriptionsListSerializer.
         '''
 
         user = self.context.get('request').user
         if user.is_anonymous or (user == obj):
             return False
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is not None:
+            return obj.id in subscriptions
         return Subscribe.objects.filter(user=user, author=obj).exists()
 
 
@@ -107,16 +203,94 @@ class PasswordSerializer(serializers.Serializer):
         return new_password
 
 
+class IngredientsListSerializer(serializers.ListSerializer):
+    '''
+    Список ингредиентов рецепта, который одним запросом находит
+    все переданные ингредиенты и передаёт их полям id
+    через context['ingredients_by_id'].
+    '''
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = {
+                int(item['id']) for item in data
+                if isinstance(item, dict) and str(item.get('id')).isdecimal()
+            }
+            self.context['ingredients_by_id'] = Ingredient.objects.in_bulk(
+                ids
+            )
+        return super().to_internal_value(data)
+
+
+class IngredientField(serializers.PrimaryKeyRelatedField):
+    '''
+    Поле ингредиента по id. Берёт ингредиент из найденных
+    IngredientsListSerializer, ошибки те же, что у PrimaryKeyRelatedField.
+    '''
+
+    def to_internal_value(self, data):
+        ingredients = self.context.get('ingredients_by_id')
+        if ingredients is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            ingredient = ingredients.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if ingredient is None:
+            self.fail('does_not_exist', pk_value=data)
+        return ingredient
+
+
 class AddIngredientSerializer(serializers.ModelSerializer):
     '''Сериализатор добавления ингредиента.'''
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = IngredientField(queryset=Ingredient.objects.all())
 
     class Meta:
         model = IngredientAmount
+        list_serializer_class = IngredientsListSerializer
         fields = ('id', 'amount')
 
 
+class Base64UploadField(Base64FileField):
+    '''
+    Фото в base64. В запросе данные только декодируются, а формат
+    определяется по заголовку: полная проверка и перекодирование
+    выполняются воркером process_images.
+    '''
+
+    ALLOWED_TYPES = ('jpg', 'png', 'gif', 'webp')
+    INVALID_FILE_MESSAGE = 'Загрузите корректное изображение.'
+    INVALID_TYPE_MESSAGE = 'Не удалось определить формат изображения.'
+
+    def get_file_extension(self, filename, decoded_file):
+        extension = imghdr.what(filename, decoded_file)
+        return 'jpg' if extension == 'jpeg' else extension
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    '''
+    Ссылки на уменьшенные копии фото рецепта:
+    {вариант: {'width', 'height', 'webp', 'jpeg'}}.
+    Пока копии не готовы, отдаётся пустой словарь.
+    '''
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        representation = {}
+        for name, variant in variants.items():
+            representation[name] = {
+                key: value if key in ('width', 'height') else (
+                    request.build_absolute_uri(image_storage.url(value))
+                    if request else image_storage.url(value)
+                )
+                for key, value in variant.items()
+            }
+        return representation
+
+
 class RecipeListSerializer(serializers.ModelSerializer):
     '''Сериализатор для отображения рецептов'''
 
@@ -125,9 +299,13 @@ class RecipeListSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField(read_only=True)
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    image_variants = ImageVariantsField()
+
+    subscription_author_field = 'author_id'
 
     class Meta:
         model = Recipe
+        list_serializer_class = SubscriptionsListSerializer
         fields = (
             'id',
             'tags',
@@ -137,23 +315,28 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
+            'image_status',
             'text',
             'cooking_time',
         )
 
     def get_ingredients(self, obj):
-        '''Получение количества ингредиентов из модели IngredientAmount.'''
-        queryset = IngredientAmount.objects.filter(recipe=obj)
-        return IngredientAmountSerializer(queryset, many=True).data
+        '''
+        Получение количества ингредиентов из модели IngredientAmount.
+        Ингредиенты должны быть заранее подгружены
+        через ingredient_amounts_prefetch.
+        '''
+        return IngredientAmountSerializer(obj.ingredient.all(), many=True).data
 
 
 class RecipeSerializer(serializers.ModelSerializer):
     '''Сериализатор создания и обновления рецептов с помощью PATCH.'''
 
     author = UserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = Base64UploadField()
     ingredients = AddIngredientSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = CachedTagField(
         queryset=Tag.objects.all(),
         many=True,
         read_only=False
@@ -176,16 +359,22 @@ class RecipeSerializer(serializers.ModelSerializer):
         '''При успешном создании рецепта
         возвращает данные в представлении RecipeListSerializer.
         '''
+        prefetch_related_objects([instance], ingredient_amounts_prefetch())
         request = self.context.get('request')
         context = {'request': request}
         return RecipeListSerializer(instance, context=context).data
 
+    @transaction.atomic
     def create(self, validated_data):
         '''Создание рецепта вместе с тегами и ингредиентами.'''
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         author = self.context.get('request').user
-        recipe = Recipe.objects.create(author=author, **validated_data)
+        recipe = Recipe.objects.create(
+            author=author,
+            image_upload=validated_data.pop('image'),
+            **validated_data
+        )
         tagrecipe_list = []
         for tag in tags:
             tagrecipe = TagRecipe(tag=tag, recipe=recipe)
@@ -205,80 +394,138 @@ class RecipeSerializer(serializers.ModelSerializer):
         recipe.ingredient.bulk_create(ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, recipe, validated_data):
         '''Обновление рецепта вместе с тегами и ингредиентами.'''
         tags = validated_data.get('tags')
         ingredients = validated_data.get('ingredients')
         recipe.name = validated_data.get('name', recipe.name)
         recipe.text = validated_data.get('text', recipe.text)
-        recipe.image = validated_data.get('image', recipe.image)
+        if 'image' in validated_data:
+            recipe.image_upload = validated_data['image']
         recipe.cooking_time = validated_data.get(
             'cooking_time',
             recipe.cooking_time
         )
 
         if tags:
-            recipe.tags.clear()
-            recipe.tags.set(tags)
-
+            self.update_tags(recipe, tags)
         if ingredients:
-            recipe.ingredients.clear()
-            for ingredient in ingredients:
-                IngredientAmount.objects.get_or_create(
-                    recipe=recipe,
-                    ingredients=ingredient['id'],
-                    amount=ingredient['amount']
-                )
+            self.update_ingredients(recipe, ingredients)
         recipe.save()
         return recipe
 
+    def update_tags(self, recipe, tags):
+        '''Добавляет новые и удаляет убранные теги рецепта.'''
+        stored = dict(recipe.tag_recipe.values_list('tag', 'pk'))
+        submitted = {tag.pk for tag in tags}
+        # Сигналы не отправляются: кэш и дата изменения
+        # обновятся при recipe.save().
+        delete_rows(TagRecipe, (
+            pk for tag, pk in stored.items() if tag not in submitted
+        ))
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag_id=tag)
+            for tag in submitted - stored.keys()
+        )
+
+    def update_ingredients(self, recipe, ingredients):
+        '''
+        Сравнивает ингредиенты рецепта с переданными и выполняет
+        только нужные вставки, изменения и удаления - по одному
+        запросу на каждый вид. Списки покупок тех, у кого рецепт
+        в Корзине, получают разницу в количестве.
+        '''
+        stored = {
+            ingredient: (pk, amount)
+            for pk, ingredient, amount in recipe.ingredient.values_list(
+                'pk', 'ingredients', 'amount'
+            )
+        }
+        submitted = {
+            ingredient['id'].pk: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = stored.keys() - submitted.keys()
+        delete_rows(
+            IngredientAmount, (stored[ingredient][0] for ingredient in removed)
+        )
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(
+                recipe=recipe, ingredients_id=ingredient, amount=amount
+            )
+            for ingredient, amount in submitted.items()
+            if ingredient not in stored
+        )
+        IngredientAmount.objects.bulk_update(
+            [
+                IngredientAmount(pk=stored[ingredient][0], amount=amount)
+                for ingredient, amount in submitted.items()
+                if ingredient in stored and stored[ingredient][1] != amount
+            ],
+            ['amount'],
+        )
+        changes = {
+            ingredient: submitted.get(ingredient, 0) - amount
+            for ingredient, (pk, amount) in stored.items()
+            if submitted.get(ingredient) != amount
+        }
+        changes.update(
+            (ingredient, amount) for ingredient, amount in submitted.items()
+            if ingredient not in stored
+        )
+        if changes:
+            apply_deltas(recipe_deltas(recipe.pk, changes))
+
 
 class RecipeShortSerializer(serializers.ModelSerializer):
     '''Сериализатор с некоторыми данными из Recipe.'''
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
+            'image_status',
             'cooking_time',
         )
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
-    '''Сериализатор для списка покупок.'''
-
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
-
-    def to_representation(self, instance):
-        '''
-        При успешном добавлении рецепта в список покупок
-        возвращает данные в представлении RecipeShortSerializer.
-        '''
-        request = self.context.get('request')
-        context = {'request': request}
-        return RecipeShortSerializer(
-            instance.recipe, context=context).data
+class RecipeIdsSerializer(serializers.Serializer):
+    '''
+    Список id рецептов для массового добавления в Избранное
+    или Корзину покупок и удаления из них.
+    '''
 
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES,
+    )
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    '''Сериализатор для избранных рецептов.'''
 
-    class Meta:
-        model = Favorite
-        fields = ('user', 'recipe')
+class LatestRecipesListSerializer(serializers.ListSerializer):
+    '''
+    Список авторов, который одним запросом загружает последние
+    рецепты всех авторов страницы (не больше recipes_limit на автора)
+    и передаёт их вложенным сериализаторам через context['latest_recipes'].
+    '''
 
-    def to_representation(self, instance):
-        '''При успешном добавлении рецепта в Избранное
-        возвращает данные в представлении RecipeShortSerializer.
-        '''
-        request = self.context.get('request')
-        context = {'request': request}
-        return RecipeShortSerializer(
-            instance.recipe, context=context).data
+    def to_representation(self, data):
+        authors = list(
+            data.all() if isinstance(data, models.Manager) else data
+        )
+        latest = defaultdict(list)
+        for recipe in Recipe.objects.latest_per_author(
+            authors, get_recipes_limit(self.context.get('request'))
+        ):
+            latest[recipe.author_id].append(recipe)
+        self.context['latest_recipes'] = latest
+        return super().to_representation(authors)
 
 
 class UserSubscribeSerializer(UserSerializer):
@@ -286,7 +533,7 @@ class UserSubscribeSerializer(UserSerializer):
     Сериализатор вывода авторов на которых подписан текущий пользователь.
     '''
 
-    recipes = RecipeShortSerializer(many=True, read_only=True)
+    recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
 
@@ -303,6 +550,7 @@ class UserSubscribeSerializer(UserSerializer):
             'recipes_count',
         )
         read_only_fields = '__all__',
+        list_serializer_class = LatestRecipesListSerializer
 
     def get_is_subscribed(self, obj):
         '''
@@ -310,22 +558,22 @@ class UserSubscribeSerializer(UserSerializer):
         '''
         return True
 
-    def get_recipes_count(self, obj):
-        '''Количество рецептов автора.'''
-        return obj.recipes.count()
-
-
-class SubscribeSerializer(serializers.ModelSerializer):
-    '''Подписка на авторов и создание новой записи в Subsribe.'''
-
-    class Meta:
-        model = Subscribe
-        fields = ('user', 'author')
-
-    def to_representation(self, instance):
-        '''При успешной подписке
-        возвращает данные в представлении UserSubscribeSerializer.
+    def get_recipes(self, obj):
         '''
-        request = self.context.get('request')
-        context = {'request': request}
-        return UserSubscribeSerializer(instance.author, context=context).data
+        Последние рецепты автора. Для списков они загружены заранее
+        в LatestRecipesListSerializer.
+        '''
+        latest = self.context.get('latest_recipes')
+        if latest is not None:
+            recipes = latest.get(obj.pk, [])
+        else:
+            recipes = Recipe.objects.latest_per_author(
+                [obj], get_recipes_limit(self.context.get('request'))
+            )
+        return RecipeShortSerializer(
+            recipes, many=True, context=self.context
+        ).data
+
+    def get_recipes_count(self, obj):
+        '''Количество рецептов автора (денормализованный счётчик).'''
+        return obj.recipes_count
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag, TagRecipe
+from recipes.signals import counters_changed
+
+from .cache import bump_version
+
+User = get_user_model()
+
+
+def bump_after_commit(*names):
+    '''Повышает версии кэша после фиксации текущей транзакции.'''
+    transaction.on_commit(lambda: bump_version(*names))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    '''Рецепт изменился: сбрасываем списки и сам рецепт.'''
+    bump_after_commit('recipes', f'recipe:{instance.pk}')
+
+
+@receiver(counters_changed, sender=Recipe)
+def recipe_counters_changed(sender, **kwargs):
+    '''
+    Изменились счётчики избранного или корзин: сбрасываем списки,
+    отсортированные или отфильтрованные по ним.
+    '''
+    bump_after_commit('counters')
+
+
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def recipe_relation_changed(sender, instance, **kwargs):
+    '''Изменились теги или ингредиенты рецепта.'''
+    bump_after_commit('recipes', f'recipe:{instance.recipe_id}')
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tags_changed(sender, instance, **kwargs):
+    '''Изменился справочник тегов.'''
+    bump_after_commit('catalog', 'tags')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredients_changed(sender, instance, **kwargs):
+    '''Изменился справочник ингредиентов.'''
+    bump_after_commit('catalog', 'ingredients')
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, created, update_fields=None, **kwargs):
+    '''
+    Изменились данные автора, которые выводятся в рецептах.
+    Новые пользователи и обновление одного last_login кэш не затрагивают.
+    '''
+    if created or (update_fields and set(update_fields) == {'last_login'}):
+        return
+    bump_after_commit('recipes', f'author:{instance.pk}')
@@ -0,0 +1,123 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+RECIPES_URL = '/api/recipes/'
+STATS_URL = '/api/cache_stats/'
+
+
+def test_anonymous_list_is_cached(anonymous_client, user, make_recipe):
+    make_recipe(user)
+    first = anonymous_client.get('/api/recipes/')
+    second = anonymous_client.get('/api/recipes/')
+    assert first['X-Cache'] == 'MISS'
+    assert second['X-Cache'] == 'HIT'
+    assert second.data == first.data
+
+
+def test_cache_stats_endpoint(anonymous_client, staff_client):
+    anonymous_client.get('/api/recipes/')
+    anonymous_client.get('/api/recipes/')
+    response = staff_client.get(STATS_URL)
+    assert response.status_code == 200
+    assert response.data['hits'] == 1
+    assert response.data['misses'] == 1
+    assert response.data['process_local'] is True
+
+
+def test_cache_stats_is_staff_only(user_client, anonymous_client):
+    assert user_client.get(STATS_URL).status_code == 403
+    assert anonymous_client.get(STATS_URL).status_code == 401
+
+
+def test_cache_stats_command_warns_about_local_cache(db):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    call_command('cache_stats', stdout=stdout, stderr=stderr)
+    assert 'hits: 0' in stdout.getvalue()
+    assert 'LocMemCache' in stderr.getvalue()
+
+
+@pytest.fixture
+def recipe(user, make_recipe):
+    return make_recipe(user)
+
+
+@pytest.fixture
+def write(django_capture_on_commit_callbacks):
+    '''Выполняет запись, как запрос: с вызовом колбэков on_commit.'''
+
+    def run(action, *args, **kwargs):
+        with django_capture_on_commit_callbacks(execute=True):
+            return action(*args, **kwargs)
+
+    return run
+
+
+def cached(client, url, params=None):
+    '''Берёт ответ в кэш и возвращает, отдаётся ли он следующему запросу.'''
+    client.get(url, params)
+    return client.get(url, params)['X-Cache'] == 'HIT'
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/favorite/', '/api/recipes/shopping_cart/',
+))
+def test_counter_lists_invalidated_by_bulk_links(anonymous_client, write,
+                                                 make_client, make_user,
+                                                 recipe, url):
+    by_favorites = {'ordering': '-favorites_count'}
+    by_min = {'min_favorites': 1}
+    reader = make_client(make_user())
+    for method in (reader.post, reader.delete):
+        assert cached(anonymous_client, RECIPES_URL, by_favorites)
+        assert cached(anonymous_client, RECIPES_URL, by_min)
+        assert cached(anonymous_client, RECIPES_URL)
+        response = write(method, url, {'recipes': [recipe.pk]}, format='json')
+        assert response.status_code in (200, 201)
+        for params in (by_favorites, by_min):
+            assert anonymous_client.get(
+                RECIPES_URL, params
+            )['X-Cache'] == 'MISS'
+        # Список без сортировки по счётчикам от них не зависит.
+        assert anonymous_client.get(RECIPES_URL)['X-Cache'] == 'HIT'
+
+
+def test_favorite_invalidates_counter_lists(anonymous_client, write,
+                                            make_client, make_user, recipe):
+    reader = make_client(make_user())
+    url = f'{RECIPES_URL}{recipe.pk}/favorite/'
+    params = {'min_favorites': 1}
+    assert anonymous_client.get(RECIPES_URL, params).data['count'] == 0
+    assert write(reader.post, url).status_code == 201
+    assert anonymous_client.get(RECIPES_URL, params).data['count'] == 1
+    assert write(reader.delete, url).status_code == 204
+    assert anonymous_client.get(RECIPES_URL, params).data['count'] == 0
+
+
+def test_recipe_edit_invalidates_list_and_detail(anonymous_client, write,
+                                                 user_client, recipe):
+    detail = f'{RECIPES_URL}{recipe.pk}/'
+    assert cached(anonymous_client, RECIPES_URL)
+    assert cached(anonymous_client, detail)
+    response = write(
+        user_client.patch, detail, {'name': 'Новое название'}, format='json'
+    )
+    assert response.status_code == 200
+    for url in (RECIPES_URL, detail):
+        response = anonymous_client.get(url)
+        assert response['X-Cache'] == 'MISS'
+    assert response.data['name'] == 'Новое название'
+
+
+def test_tag_edit_invalidates_list_and_detail(anonymous_client, write,
+                                              recipe, tags):
+    detail = f'{RECIPES_URL}{recipe.pk}/'
+    assert cached(anonymous_client, RECIPES_URL)
+    assert cached(anonymous_client, detail)
+    tags[0].name = 'Поздний завтрак'
+    write(tags[0].save)
+    for url in (RECIPES_URL, detail):
+        response = anonymous_client.get(url)
+        assert response['X-Cache'] == 'MISS'
+    assert 'Поздний завтрак' in [tag['name'] for tag in response.data['tags']]
@@ -0,0 +1,27 @@
+from api.catalog import _catalog, get_tag_catalog
+from recipes.models import Tag
+
+RECIPES_URL = '/api/recipes/'
+
+
+def test_tag_filter_sees_new_tag(anonymous_client, tags,
+                                 django_capture_on_commit_callbacks):
+    get_tag_catalog()
+    with django_capture_on_commit_callbacks(execute=True):
+        Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    response = anonymous_client.get(RECIPES_URL, {'tags': 'dinner'})
+    assert response.status_code == 200
+
+
+def test_catalog_expires(anonymous_client, tags):
+    '''Тег из другого процесса (без сигнала здесь) виден после TTL.'''
+    get_tag_catalog()
+    Tag.objects.bulk_create(
+        [Tag(name='Ужин', color='#8775D2', slug='dinner')]
+    )
+    response = anonymous_client.get(RECIPES_URL, {'tags': 'dinner'})
+    assert response.status_code == 400
+    _catalog.built -= _catalog.ttl + 1
+    assert 'dinner' in get_tag_catalog().by_slug
+    response = anonymous_client.get(RECIPES_URL, {'tags': 'dinner'})
+    assert response.status_code == 200
@@ -0,0 +1,73 @@
+import logging
+
+import pytest
+from api.decorators import QueryBudgetError, budgeted_stream, query_budget
+from django.db import connection
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+
+class View:
+    @query_budget(1)
+    def within(self, request):
+        return User.objects.count()
+
+    @query_budget(1)
+    def over(self, request):
+        return User.objects.count() + User.objects.count()
+
+    @query_budget(0)
+    def failing(self, request):
+        User.objects.count()
+        raise ValueError
+
+
+@pytest.fixture
+def request_():
+    return APIRequestFactory().get('/')
+
+
+@pytest.mark.django_db
+def test_query_budget_within_limit(request_):
+    assert View().within(request_) == 0
+
+
+@pytest.mark.django_db
+def test_query_budget_raises_in_tests(request_):
+    with pytest.raises(QueryBudgetError, match='View.over: 2 .* 1'):
+        View().over(request_)
+
+
+@pytest.mark.django_db
+def test_query_budget_logs(settings, caplog, request_):
+    settings.QUERY_BUDGET_RAISE = False
+    with caplog.at_level(logging.WARNING, logger='api.decorators'):
+        assert View().over(request_) == 0
+    assert 'View.over: 2' in caplog.text
+
+
+@pytest.mark.django_db
+def test_query_budget_keeps_view_errors(request_):
+    with pytest.raises(ValueError):
+        View().failing(request_)
+    assert not connection.execute_wrappers
+
+
+def counted_chunks():
+    for _ in range(2):
+        yield str(User.objects.count())
+
+
+@pytest.mark.django_db
+def test_budgeted_stream_counts_generator_queries():
+    assert list(budgeted_stream('stream', 2, counted_chunks())) == ['0', '0']
+    with pytest.raises(QueryBudgetError, match='stream: 2'):
+        list(budgeted_stream('stream', 1, counted_chunks()))
+
+
+@pytest.mark.django_db
+def test_budgeted_stream_ignores_queries_between_chunks():
+    stream = budgeted_stream('stream', 1, iter(['a', 'b']))
+    for chunk in stream:
+        User.objects.count()
+    assert not connection.execute_wrappers
@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+import re
+import zlib
+
+import pytest
+from fontTools.ttLib import TTFont
+
+URL = '/api/recipes/download_shopping_cart/'
+LINES = ['молоко: 20 мл', 'мука: 20 г', 'яйца: 20 шт']
+
+
+@pytest.fixture
+def cart(user, user_client, make_recipe):
+    for _ in range(2):
+        recipe = make_recipe(user)
+        response = user_client.post(f'/api/recipes/{recipe.pk}/shopping_cart/')
+        assert response.status_code == 201
+
+
+def download(client, file_type):
+    response = client.get(URL, {'type': file_type})
+    assert response.status_code == 200
+    return b''.join(response.streaming_content)
+
+
+def test_txt(cart, user_client, user):
+    text = download(user_client, 'txt').decode()
+    assert text.splitlines() == [
+        f'Список покупок пользователя {user.username}', *LINES
+    ]
+
+
+def test_csv(cart, user_client):
+    rows = list(csv.reader(io.StringIO(
+        download(user_client, 'csv').decode('utf-8-sig')
+    )))
+    assert rows == [
+        ['name', 'amount', 'measurement_unit'],
+        ['молоко', '20', 'мл'],
+        ['мука', '20', 'г'],
+        ['яйца', '20', 'шт'],
+    ]
+
+
+def test_json(cart, user_client):
+    assert json.loads(download(user_client, 'json')) == [
+        {'name': 'молоко', 'amount': 20, 'measurement_unit': 'мл'},
+        {'name': 'мука', 'amount': 20, 'measurement_unit': 'г'},
+        {'name': 'яйца', 'amount': 20, 'measurement_unit': 'шт'},
+    ]
+
+
+def test_pdf(cart, user_client):
+    data = download(user_client, 'pdf')
+    assert data.startswith(b'%PDF-1.4')
+    assert data.endswith(b'%%EOF\n')
+    # Таблица xref указывает на начало каждого объекта.
+    xref = int(re.search(rb'startxref\n(\d+)', data).group(1))
+    assert data[xref:].startswith(b'xref')
+    offsets = re.findall(rb'(\d{10}) 00000 n', data[xref:])
+    for number, offset in enumerate(offsets, 1):
+        assert data[int(offset):].startswith(f'{number} 0 obj'.encode())
+    # Встроено только подмножество шрифта с использованными глифами.
+    assert len(data) < 20000
+    length, = re.search(
+        rb'/FontFile2 \d+ 0 R >>\nendobj\n\d+ 0 obj\n<< /Length (\d+)', data
+    ).groups()
+    start = data.index(b'stream\n', data.index(b'/Length1')) + 7
+    font = TTFont(io.BytesIO(zlib.decompress(data[start:start + int(length)])))
+    glyphs = font['glyf']
+    assert glyphs[font.getBestCmap()[ord('м')]].numberOfContours > 0
+    outlined = [name for name in glyphs.keys()
+                if glyphs[name].numberOfContours]
+    assert len(outlined) < 40
+
+
+@pytest.mark.parametrize('content', (None, b'not a font'))
+def test_pdf_font_error(cart, user_client, settings, tmp_path, content):
+    font = tmp_path / 'font.ttf'
+    if content is not None:
+        font.write_bytes(content)
+    settings.SHOPPING_LIST_PDF_FONT = str(font)
+    response = user_client.get(URL, {'type': 'pdf'})
+    assert response.status_code == 500
+    assert not response.streaming
+    assert 'errors' in response.data
+
+
+def test_unknown_type_and_empty_cart(user_client):
+    assert user_client.get(URL, {'type': 'xml'}).status_code == 400
+    assert user_client.get(URL).status_code == 400
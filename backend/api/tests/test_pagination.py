@@ -0,0 +1,122 @@
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from api import pagination
+from api.pagination import (ApproximateCountPaginator, approximate_count,
+                            estimate_count)
+from django.utils import timezone
+from recipes.models import Recipe
+from users.models import User
+
+
+@pytest.fixture
+def users(make_user):
+    for _ in range(10):
+        make_user()
+    return User.objects.order_by('pk')
+
+
+@pytest.fixture
+def estimate(monkeypatch):
+    '''Подменяет оценку планировщика заданным значением.'''
+
+    def set_estimate(value):
+        monkeypatch.setattr(pagination, 'estimate_count', lambda qs: value)
+
+    return set_estimate
+
+
+def test_small_selection_is_counted_exactly(users, estimate):
+    estimate(10 ** 6)
+    assert approximate_count(users, 10) == (10, False)
+    assert approximate_count(users.filter(pk=users[0].pk), 10) == (1, False)
+
+
+def test_large_selection_uses_estimate(users, estimate):
+    estimate(500)
+    assert approximate_count(users, 5) == (500, True)
+
+
+def test_underestimate_is_not_below_exact_cap(users, estimate):
+    estimate(1)
+    assert approximate_count(users, 5) == (6, True)
+
+
+def test_without_estimate_counts_everything(users, estimate):
+    estimate(None)
+    assert approximate_count(users, 5) == (10, False)
+
+
+def test_pages_after_underestimate_are_served(users, estimate):
+    estimate(1)
+    paginator = ApproximateCountPaginator(users, 2)
+    paginator.threshold = 3
+    page = paginator.page(5)
+    assert list(page) == list(users[8:10])
+    assert paginator.count_is_approximate
+    assert list(paginator.page(6)) == []
+
+
+@pytest.mark.postgresql
+def test_estimate_count_on_postgresql(users):
+    assert isinstance(estimate_count(users), int)
+
+
+def walk(client, params, link='next'):
+    '''id рецептов всех страниц ленты по ссылкам next (или previous).'''
+    ids = []
+    while params is not None:
+        response = client.get('/api/recipes/', params)
+        assert response.status_code == 200
+        page = [recipe['id'] for recipe in response.data['results']]
+        ids.extend(page if link == 'next' else reversed(page))
+        params = response.data[link] and dict(
+            parse_qsl(urlsplit(response.data[link]).query)
+        )
+    return ids, response
+
+
+def test_cursor_pages_with_equal_pub_date(user, user_client, make_recipe):
+    '''Рецепты с одинаковым pub_date не теряются и не повторяются.'''
+    recipes = [make_recipe(user) for _ in range(15)]
+    published = timezone.now()
+    Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in recipes[3:12]]
+    ).update(pub_date=published)
+    expected = list(Recipe.objects.order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', flat=True))
+    ids, last = walk(user_client, {'pagination': 'cursor', 'limit': 4})
+    assert ids == expected
+
+    # Назад от последней страницы - в обратном порядке.
+    previous = dict(parse_qsl(urlsplit(last.data['previous']).query))
+    backwards, first = walk(user_client, previous, link='previous')
+    assert backwards == expected[-len(last.data['results']) - 1::-1]
+    assert first.data['previous'] is None
+
+
+def test_cursor_pages_stable_on_insert_with_equal_pub_date(user, user_client,
+                                                           make_recipe):
+    '''
+    Рецепт с тем же pub_date, добавленный во время листания, не сдвигает
+    следующие страницы (при смещении вместо позиции рецепт повторился бы).
+    '''
+    recipes = [make_recipe(user) for _ in range(10)]
+    published = timezone.now()
+    Recipe.objects.update(pub_date=published)
+    response = user_client.get(
+        '/api/recipes/', {'pagination': 'cursor', 'limit': 4}
+    )
+    ids = [recipe['id'] for recipe in response.data['results']]
+    Recipe.objects.filter(pk=make_recipe(user).pk).update(pub_date=published)
+    rest, last = walk(
+        user_client, dict(parse_qsl(urlsplit(response.data['next']).query))
+    )
+    assert ids + rest == [recipe.pk for recipe in reversed(recipes)]
+
+
+def test_invalid_cursor_position(user_client, db):
+    '''Курсор с позицией p=nope.'''
+    response = user_client.get('/api/recipes/', {'cursor': 'cD1ub3Bl'})
+    assert response.status_code == 404
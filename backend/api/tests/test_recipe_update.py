@@ -0,0 +1,127 @@
+import pytest
+from api.catalog import get_tag_catalog
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import (Ingredient, IngredientAmount, ShoppingListItem,
+                            Tag, TagRecipe)
+from recipes.shopping_list import find_mismatches
+
+# Ингредиенты большого рецепта в test_update_queries_do_not_grow:
+# 20 изменённых, 20 оставленных, 15 удалённых и 15 новых -
+# 50 изменений.
+CHANGED, KEPT, CHANGES = 20, 20, 15
+
+
+@pytest.fixture
+def recipe(user, make_recipe):
+    return make_recipe(user)
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient__name', 'amount'
+    ))
+
+
+def test_update_ingredients_and_tags(user_client, make_user, make_client,
+                                     recipe, tags, ingredients):
+    buyer = make_user()
+    buyer_client = make_client(buyer)
+    url = f'/api/recipes/{recipe.pk}/'
+    assert buyer_client.post(f'{url}shopping_cart/').status_code == 201
+    flour, milk, eggs = ingredients
+    honey = Ingredient.objects.create(name='мёд', measurement_unit='г')
+    response = user_client.patch(url, {
+        'tags': [tags[0].pk],
+        'ingredients': [
+            {'id': flour.pk, 'amount': 10},
+            {'id': milk.pk, 'amount': 25},
+            {'id': honey.pk, 'amount': 5},
+        ],
+    }, format='json')
+    assert response.status_code == 200
+    assert list(TagRecipe.objects.filter(recipe=recipe).values_list(
+        'tag', flat=True
+    )) == [tags[0].pk]
+    assert dict(IngredientAmount.objects.filter(
+        recipe=recipe
+    ).values_list('ingredients__name', 'amount')) == {
+        'мука': 10, 'молоко': 25, 'мёд': 5,
+    }
+    assert shopping_list(buyer) == {'мука': 10, 'молоко': 25, 'мёд': 5}
+    assert [tag['id'] for tag in response.data['tags']] == [tags[0].pk]
+
+
+def count_queries(client, recipe, tags, ingredients):
+    '''
+    Число запросов к БД при изменении тегов и ингредиентов
+    рецепта: ingredients - {ингредиент: количество}.
+    '''
+    with CaptureQueriesContext(connection) as context:
+        response = client.patch(f'/api/recipes/{recipe.pk}/', {
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': amount}
+                for ingredient, amount in ingredients.items()
+            ],
+        }, format='json')
+    assert response.status_code == 200, response.data
+    return len(context)
+
+
+def test_update_queries_do_not_grow(user, user_client, make_user,
+                                    make_client, make_recipe, recipe,
+                                    tags, ingredients,
+                                    django_capture_on_commit_callbacks):
+    '''
+    Изменение 50 ингредиентов и нескольких тегов рецепта в Корзине
+    занимает столько же запросов, сколько изменение трёх: в обоих
+    правках есть вставки, изменения и удаления ингредиентов и тегов,
+    а строки списка покупок обнуляются.
+    '''
+    # По одному: сигналы тегов сбрасывают их кэш.
+    with django_capture_on_commit_callbacks(execute=True):
+        new_tags = [
+            Tag.objects.create(
+                name=f'тег {number}', color=f'#0000{number:02}',
+                slug=f'tag{number}',
+            ) for number in range(6)
+        ]
+    # Справочник тегов перечитывается до замеров.
+    get_tag_catalog()
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(CHANGED + KEPT + 2 * CHANGES + 1)
+    )
+    extra = list(Ingredient.objects.filter(
+        name__startswith='ингредиент '
+    ).order_by('pk'))
+    big = make_recipe(user)
+    stored, added = extra[:-CHANGES - 1], extra[-CHANGES - 1:-1]
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=big, ingredients=ingredient, amount=10)
+        for ingredient in stored
+    )
+    buyer_client = make_client(make_user())
+
+    def add_to_cart(recipe):
+        url = f'/api/recipes/{recipe.pk}/shopping_cart/'
+        assert buyer_client.post(url).status_code == 201
+
+    add_to_cart(recipe)
+    flour, milk = ingredients[:2]
+    small_queries = count_queries(
+        user_client, recipe, [tags[1], new_tags[0]],
+        {flour: 20, milk: 10, extra[-1]: 5},
+    )
+
+    add_to_cart(big)
+    submitted = {ingredient: 20 for ingredient in stored[:CHANGED]}
+    submitted.update(
+        (ingredient, 10) for ingredient in stored[CHANGED:CHANGED + KEPT]
+    )
+    submitted.update((ingredient, 5) for ingredient in added)
+    assert count_queries(
+        user_client, big, [tags[1], *new_tags[1:]], submitted
+    ) == small_queries
+    assert not list(find_mismatches())
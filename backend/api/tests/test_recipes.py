@@ -0,0 +1,93 @@
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+RECIPES_URL = '/api/recipes/'
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context), response.data['results']
+
+
+@pytest.mark.parametrize('total', (1, 6, 20))
+def test_list_page_query_count(user, user_client, make_user, make_recipe,
+                               total):
+    '''
+    Число запросов страницы не зависит от числа рецептов на ней:
+    токен, подсчёт, рецепты, теги, ингредиенты, подписки на авторов.
+    '''
+    authors = [make_user() for _ in range(3)]
+    for number in range(total):
+        make_recipe(authors[number % len(authors)])
+    queries, results = count_queries(user_client, RECIPES_URL)
+    assert len(results) == min(total, 6)
+    assert all(len(recipe['ingredients']) == 3 for recipe in results)
+    assert queries == 6
+
+
+@pytest.mark.parametrize('limit', (1, 5, 20))
+def test_cursor_page_query_count(user_client, user, make_recipe, limit):
+    '''Курсорная страница: те же запросы, только без подсчёта.'''
+    for _ in range(20):
+        make_recipe(user)
+    queries, results = count_queries(
+        user_client, f'{RECIPES_URL}?pagination=cursor&limit={limit}'
+    )
+    assert len(results) == limit
+    assert queries == 5
+
+
+@pytest.mark.parametrize('params', (
+    {'author': 'me'},
+    {'tags': 'breakfast'},
+    {'tags': ['breakfast', 'lunch']},
+    {'is_favorited': 1},
+    {'is_in_shopping_cart': 1},
+    {'is_favorited': 1, 'is_in_shopping_cart': 1},
+    {'author': 'me', 'tags': 'lunch', 'is_favorited': 1,
+     'is_in_shopping_cart': 0},
+))
+@pytest.mark.parametrize('anonymous', (False, True))
+def test_filtered_list_fits_query_budget(user, make_client, make_recipe,
+                                         params, anonymous):
+    '''
+    Фильтры укладываются в query_budget списка (в тестах превышение -
+    ошибка) и при холодном снимке тегов: кэш очищается перед тестом.
+    '''
+    recipes = [make_recipe(user) for _ in range(3)]
+    for recipe in recipes[:2]:
+        user.user_favorites.create(recipe=recipe)
+    user.carts.create(recipe=recipes[1])
+    if params.get('author') == 'me':
+        params = {**params, 'author': user.pk}
+    client = make_client(None if anonymous else user)
+    response = client.get(RECIPES_URL, params)
+    assert response.status_code == 200
+    assert response.data['count'] >= 1
+
+
+def test_conditional_detail_after_favorite(user, user_client, make_recipe):
+    '''
+    Ответ зависит от избранного пользователя, которое не видно по датам
+    изменения: Last-Modified не отдаётся, If-Modified-Since не даёт 304.
+    '''
+    url = f'{RECIPES_URL}{make_recipe(user).pk}/'
+    response = user_client.get(url)
+    assert 'Last-Modified' not in response
+    etag = response['ETag']
+    assert user_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    assert user_client.post(f'{url}favorite/').status_code == 201
+    later = http_date(time.time() + 3600)
+    response = user_client.get(url, HTTP_IF_MODIFIED_SINCE=later)
+    assert response.status_code == 200
+    assert response.data['is_favorited'] is True
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
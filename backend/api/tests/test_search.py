@@ -0,0 +1,59 @@
+import io
+
+from api.search import _index, get_ingredient_index
+from django.core.management import call_command
+from recipes.models import Ingredient
+
+URL = '/api/ingredients/'
+
+
+def names(response):
+    assert response.status_code == 200
+    return [ingredient['name'] for ingredient in response.data]
+
+
+def test_autocomplete(anonymous_client, ingredients):
+    assert names(anonymous_client.get(URL, {'name': 'мо'})) == ['молоко']
+    assert names(anonymous_client.get(URL, {'name': 'малоко'})) == ['молоко']
+
+
+def test_new_ingredient_is_found(anonymous_client, ingredients,
+                                 django_capture_on_commit_callbacks):
+    get_ingredient_index()
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='мёд', measurement_unit='г')
+    assert names(anonymous_client.get(URL, {'name': 'мёд'})) == ['мёд']
+
+
+def test_index_expires(ingredients):
+    '''Изменения без сигнала (другой процесс) видны после INDEX_TTL.'''
+    get_ingredient_index()
+    Ingredient.objects.bulk_create(
+        [Ingredient(name='мёд', measurement_unit='г')]
+    )
+    assert not get_ingredient_index().search('мёд')
+    _index.built -= _index.ttl + 1
+    assert get_ingredient_index().search('мёд')
+
+
+def test_results_keep_index_order(anonymous_client, ingredients):
+    Ingredient.objects.create(name='сухое молоко', measurement_unit='г')
+    assert names(anonymous_client.get(URL, {'name': 'молоко'})) == [
+        'молоко', 'сухое молоко'
+    ]
+
+
+def test_benchmark_search(ingredients):
+    '''Справочник для замера создаётся в транзакции и откатывается.'''
+    stdout = io.StringIO()
+    call_command(
+        'benchmark_search', ingredients=300, queries=5, stdout=stdout
+    )
+    lines = stdout.getvalue().splitlines()
+    assert lines[0].startswith('Ингредиентов: ')
+    assert [line.split()[:2] for line in lines[2:]] == [
+        [path, kind]
+        for path in ('index', 'icontains', 'istartswith')
+        for kind in ('prefix', 'substring', 'typo')
+    ]
+    assert Ingredient.objects.count() == len(ingredients)
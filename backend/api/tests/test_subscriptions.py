@@ -0,0 +1,108 @@
+import statistics
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.dataset import generate_dataset
+from recipes.models import Subscribe
+from users.models import User
+
+URL = '/api/users/subscriptions/'
+
+# Подписки читателя в test_many_subscriptions и допустимое время
+# ответа (медиана), с запасом для медленных машин CI.
+FOLLOWED_AUTHORS = 10000
+MAX_LATENCY = 0.5
+
+
+@pytest.mark.parametrize('params', (
+    {}, {'pagination': 'cursor'}, {'limit': 0}, {'recipes_limit': 0},
+))
+def test_no_subscriptions(user_client, params):
+    response = user_client.get(URL, params)
+    assert response.status_code == 200
+    assert response.data['results'] == []
+
+
+def test_latest_recipes_of_authors(user, user_client, make_user, make_recipe):
+    authors = [make_user() for _ in range(2)]
+    for author in authors:
+        Subscribe.objects.create(user=user, author=author)
+    recipes = [make_recipe(authors[0]) for _ in range(3)]
+    response = user_client.get(URL, {'recipes_limit': 2})
+    assert response.status_code == 200
+    assert [author['id'] for author in response.data['results']] == [
+        authors[1].pk, authors[0].pk
+    ]
+    assert response.data['results'][1]['recipes_count'] == 3
+    assert [
+        recipe['id'] for recipe in response.data['results'][1]['recipes']
+    ] == [recipes[2].pk, recipes[1].pk]
+    assert response.data['results'][0]['recipes'] == []
+
+
+@pytest.fixture
+def reader(make_user):
+    '''Пользователь, подписанный на FOLLOWED_AUTHORS авторов с рецептами.'''
+    reader = make_user(username='reader', email='reader@example.com')
+    generate_dataset(
+        users=FOLLOWED_AUTHORS, recipes=2 * FOLLOWED_AUTHORS,
+        ingredients=1, favorites=0, carts=0, subscriptions=0,
+        report=lambda stage, rows: None,
+    )
+    Subscribe.objects.bulk_create(
+        (
+            Subscribe(user=reader, author_id=pk)
+            for pk in User.objects.exclude(pk=reader.pk).values_list(
+                'pk', flat=True
+            )
+        ),
+        batch_size=1000,
+    )
+    return reader
+
+
+def measure(client, url, params):
+    '''Число запросов к БД и медиана времени трёх одинаковых ответов.'''
+    timings = []
+    for _ in range(3):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(url, params)
+            timings.append(time.perf_counter() - started)
+        assert response.status_code == 200
+    return response, len(context), statistics.median(timings)
+
+
+def test_many_subscriptions(reader, make_client):
+    '''
+    Страницы подписок на FOLLOWED_AUTHORS авторов, в начале и в конце
+    списка: токен, подсчёт (курсором - без него), авторы, их рецепты.
+    '''
+    client = make_client(reader)
+    params = {'limit': 10, 'recipes_limit': 3}
+    seen = []
+    for page in (1, FOLLOWED_AUTHORS // 10):
+        response, queries, latency = measure(
+            client, URL, {**params, 'page': page}
+        )
+        assert queries == 4
+        assert latency < MAX_LATENCY
+        assert response.data['count'] == FOLLOWED_AUTHORS
+        assert len(response.data['results']) == 10
+        assert all(
+            len(author['recipes']) <= 3 for author in response.data['results']
+        )
+        seen.append([author['id'] for author in response.data['results']])
+    assert response.data['next'] is None
+
+    cursor = {**params, 'pagination': 'cursor'}
+    for number in range(2):
+        response, queries, latency = measure(client, URL, cursor)
+        assert queries == 3
+        assert latency < MAX_LATENCY
+        ids = [author['id'] for author in response.data['results']]
+        assert ids == seen[0] if number == 0 else not set(ids) & set(seen[0])
+        cursor = dict(parse_qsl(urlsplit(response.data['next']).query))
@@ -0,0 +1,148 @@
+import threading
+
+import pytest
+from django.db import connection
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, ShoppingListItem, Subscribe)
+from recipes.shopping_list import find_mismatches
+
+THREADS = 8
+# Рецепты и ингредиенты рецепта в test_bulk_cart_many_ingredients:
+# 700 пар (пользователь, ингредиент) - больше BATCH_SIZE.
+BULK_RECIPES = 100
+RECIPE_INGREDIENTS = 7
+
+
+def parallel(requests):
+    '''
+    Выполняет функции requests одновременно, каждую в своём потоке
+    со своим соединением с БД. Возвращает коды ответов.
+    '''
+    barrier = threading.Barrier(len(requests))
+    codes = [None] * len(requests)
+
+    def run(number, request):
+        try:
+            barrier.wait()
+            codes[number] = request().status_code
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=run, args=(number, request))
+        for number, request in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(codes)
+
+
+def toggle_urls(recipe, author):
+    return {
+        Favorite: f'/api/recipes/{recipe.pk}/favorite/',
+        ShoppingCart: f'/api/recipes/{recipe.pk}/shopping_cart/',
+        Subscribe: f'/api/users/{author.pk}/subscribe/',
+    }
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user()
+
+
+@pytest.fixture
+def recipe(author, make_recipe):
+    return make_recipe(author)
+
+
+def check_counters(user, recipe, author, expected):
+    recipe.refresh_from_db()
+    author.refresh_from_db()
+    assert Favorite.objects.filter(user=user).count() == expected
+    assert ShoppingCart.objects.filter(user=user).count() == expected
+    assert Subscribe.objects.filter(user=user).count() == expected
+    assert recipe.favorites_count == expected
+    assert recipe.carts_count == expected
+    assert author.followers_count == expected
+    amounts = set(ShoppingListItem.objects.filter(
+        user=user
+    ).values_list('amount', flat=True))
+    assert amounts == ({10} if expected else set())
+
+
+def test_toggles_are_idempotent(user, user_client, recipe, author):
+    for url in toggle_urls(recipe, author).values():
+        assert user_client.post(url).status_code == 201
+        assert user_client.post(url).status_code == 400
+    check_counters(user, recipe, author, 1)
+    for url in toggle_urls(recipe, author).values():
+        assert user_client.delete(url).status_code == 204
+        assert user_client.delete(url).status_code == 404
+    check_counters(user, recipe, author, 0)
+
+
+@pytest.mark.postgresql
+@pytest.mark.django_db(transaction=True)
+def test_parallel_toggles(make_user, make_recipe, make_client):
+    user, author = make_user(), make_user()
+    recipe = make_recipe(author)
+    urls = toggle_urls(recipe, author).values()
+    clients = [make_client(user) for _ in range(THREADS)]
+    for url in urls:
+        codes = parallel([
+            lambda client=client: client.post(url) for client in clients
+        ])
+        assert codes == [201] + [400] * (THREADS - 1), url
+    check_counters(user, recipe, author, 1)
+    for url in urls:
+        codes = parallel([
+            lambda client=client: client.delete(url) for client in clients
+        ])
+        assert codes == [204] + [404] * (THREADS - 1), url
+    check_counters(user, recipe, author, 0)
+
+
+def test_bulk_cart_many_ingredients(user, user_client, author):
+    '''
+    Корзина из рецептов с разными ингредиентами укладывается
+    в бюджет запросов shopping_cart_bulk при любом числе пар.
+    '''
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(BULK_RECIPES * RECIPE_INGREDIENTS)
+    )
+    ingredients = list(Ingredient.objects.filter(
+        name__startswith='ингредиент '
+    ).order_by('pk'))
+    recipes = [
+        Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='Описание',
+            cooking_time=10, image='recipes_images/recipe.jpg',
+        ) for number in range(BULK_RECIPES)
+    ]
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(
+            recipe=recipe, ingredients=ingredient, amount=number + 1
+        )
+        for number, recipe in enumerate(recipes)
+        for ingredient in ingredients[
+            number * RECIPE_INGREDIENTS:(number + 1) * RECIPE_INGREDIENTS
+        ]
+    )
+    data = {'recipes': [recipe.pk for recipe in recipes]}
+    url = '/api/recipes/shopping_cart/'
+    response = user_client.post(url, data, format='json')
+    assert response.status_code == 200
+    assert {result['status'] for result in response.data['recipes']} == {
+        'added'
+    }
+    assert ShoppingListItem.objects.filter(user=user).count() == len(
+        ingredients
+    )
+    assert not list(find_mismatches())
+
+    response = user_client.delete(url, data, format='json')
+    assert response.status_code == 200
+    assert not ShoppingListItem.objects.filter(user=user).exists()
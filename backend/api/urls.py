@@ -2,7 +2,7 @@ from django.urls import include, path
 from rest_framework import routers
 from users.views import UserViewSet
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet, cache_stats
 
 router = routers.DefaultRouter()
 router.register('tags', TagViewSet, 'tags')
@@ -11,6 +11,7 @@ router.register('recipes', RecipeViewSet, 'recipes')
 router.register('users', UserViewSet, 'users')
 
 urlpatterns = (
+    path('cache_stats/', cache_stats, name='cache_stats'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
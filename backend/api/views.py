@@ -1,23 +1,114 @@
+import logging
+import os
+
 from django.contrib.auth import get_user_model
-from django.db.models import Exists, F, OuterRef, Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Subquery
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
-from rest_framework import filters, status, viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            Subscribe, Tag)
+from recipes.user_lists import add_links, remove_links
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 
-from .filters import RecipeFilter
-from .pagination import StandardResultsSetPagination
+from .cache import cache_anonymous_response, get_stats, is_process_local
+from .catalog import get_tag_catalog
+from .decorators import budgeted_stream, conditional, query_budget
+from .exports import WRITERS, shopping_list_rows
+from .filters import IngredientSearchFilter, RecipeFilter
+from .pagination import RecipeCursorPagination, StandardResultsSetPagination
+from .pdf import FONT_ERRORS
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeSerializer, ShoppingCartSerializer,
-                          TagSerializer)
+from .serializers import (IngredientSerializer, RecipeIdsSerializer,
+                          RecipeListSerializer, RecipeSerializer,
+                          RecipeShortSerializer, TagSerializer)
 
 User = get_user_model()
 
+logger = logging.getLogger(__name__)
+
+
+def catalog_validators(view, request, *args, **kwargs):
+    '''
+    Валидаторы справочника (теги, ингредиенты):
+    число записей, последняя дата изменения и параметры запроса.
+    '''
+    state = view.queryset.aggregate(
+        count=Count('id'), modified=Max('modified')
+    )
+    return (
+        f'{state["count"]}:{state["modified"]}:'
+        f'{request.query_params.urlencode()}'
+    )
+
+
+def tag_validators(view, request, *args, **kwargs):
+    '''Валидаторы списка тегов по их снимку в памяти, без запросов к БД.'''
+    return ':'.join(
+        f'{tag.id}-{tag.modified}' for tag in get_tag_catalog().tags
+    ) + f':{request.query_params.urlencode()}'
+
+
+def last_modified(model):
+    '''Подзапрос: последняя дата изменения связанных с рецептом записей.'''
+    return Subquery(
+        model.objects.filter(
+            recipes=OuterRef('pk')
+        ).order_by('-modified').values('modified')[:1]
+    )
+
+
+def recipe_validators(view, request, *args, **kwargs):
+    '''
+    Валидаторы рецепта: даты изменения рецепта, его тегов и ингредиентов,
+    состояние обработки фото, данные автора и состояние рецепта
+    для текущего пользователя.
+    '''
+    user = request.user.id or 0
+    state = Recipe.objects.filter(pk=kwargs['pk']).annotate(
+        is_favorited=Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+        is_in_shopping_cart=Exists(
+            ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+        ),
+        is_subscribed=Exists(
+            Subscribe.objects.filter(user=user, author=OuterRef('author'))
+        ),
+        tags_modified=last_modified(Tag),
+        ingredients_modified=last_modified(Ingredient),
+    ).values(
+        'modified', 'tags_modified', 'ingredients_modified', 'image_status',
+        'is_favorited', 'is_in_shopping_cart', 'is_subscribed',
+        'author__email', 'author__username',
+        'author__first_name', 'author__last_name',
+    ).first()
+    if state is None:
+        return f'{kwargs["pk"]}:missing'
+    return f'{kwargs["pk"]}:{user}:' + ':'.join(
+        str(value) for value in state.values()
+    )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    '''
+    Счётчики кэша ответов анонимным пользователям.
+    С кэшем в памяти процесса (process_local) это счётчики процесса,
+    обработавшего запрос, а не всего сервиса.
+    '''
+    return Response({
+        **get_stats(),
+        'process_local': is_process_local(),
+        'pid': os.getpid(),
+    })
+
 
 class TagViewSet(viewsets.ModelViewSet):
     '''
@@ -27,10 +118,28 @@ class TagViewSet(viewsets.ModelViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ('name',)
     permission_classes = (IsAdminOrReadOnly,)
 
+    @conditional(tag_validators)
+    def list(self, request, *args, **kwargs):
+        '''
+        Список тегов из памяти процесса (api.catalog)
+        с поиском по названию (?search=) и условными запросами.
+        '''
+        tags = get_tag_catalog().tags
+        search = request.query_params.get('search', '').lower()
+        if search:
+            tags = [tag for tag in tags if search in tag.name.lower()]
+        return Response(self.get_serializer(tags, many=True).data)
+
+    def retrieve(self, request, pk):
+        '''Тег из памяти процесса.'''
+        try:
+            tag = get_tag_catalog().by_id[int(pk)]
+        except (KeyError, ValueError):
+            raise Http404
+        return Response(self.get_serializer(tag).data)
+
 
 class IngredientViewSet(viewsets.ModelViewSet):
     '''
@@ -40,25 +149,29 @@ class IngredientViewSet(viewsets.ModelViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ('name',)
+    filter_backends = [IngredientSearchFilter]
     permission_classes = (IsAdminOrReadOnly,)
 
+    @conditional(catalog_validators)
+    def list(self, request, *args, **kwargs):
+        '''Список ингредиентов с поддержкой условных запросов.'''
+        return super().list(request, *args, **kwargs)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     '''
     Вьюсет для работы с рецептами.
     Незарегистрованным пользователям разрешен только просмотр рецептов.
     '''
-    queryset = Recipe.objects.prefetch_related(
-        'tags',
-        'ingredients',
-    ).select_related('author')
+    queryset = Recipe.objects.select_related(
+        'author'
+    ).prefetch_related('tags').with_ingredient_amounts()
     serializer_class = RecipeSerializer
     pagination_class = StandardResultsSetPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
     permission_classes = (IsAuthorOrReadOnly,)
+    lookup_value_regex = r'\d+'
 
     def get_queryset(self):
         '''Делает подзапрос в модели Favorite и ShoppingCart.
@@ -77,98 +190,208 @@ class RecipeViewSet(viewsets.ModelViewSet):
             user=user,
             recipe=OuterRef('id')
         )
-        return Recipe.objects.annotate(
+        return super().get_queryset().annotate(
             is_favorited=Exists(favorite_recipes),
             is_in_shopping_cart=Exists(shopping_cart)
         )
 
+    @property
+    def paginator(self):
+        '''
+        По умолчанию постраничная пагинация.
+        С параметром ?pagination=cursor (или при наличии ?cursor=)
+        используется курсорная пагинация RecipeCursorPagination.
+        '''
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = RecipeCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_serializer_class(self):
+        '''Для чтения рецептов используется RecipeListSerializer.'''
+        if self.request.method in SAFE_METHODS:
+            return RecipeListSerializer
+        return RecipeSerializer
+
+    @query_budget(6)
+    @cache_anonymous_response
+    def list(self, request, *args, **kwargs):
+        '''
+        Список рецептов: подсчёт (на больших выборках - с оценкой
+        планировщика), страница рецептов, теги, ингредиенты
+        и подписки на авторов, плюс перестройка снимка тегов
+        для фильтра ?tags=.
+        Ответы анонимным пользователям кэшируются.
+        '''
+        return super().list(request, *args, **kwargs)
+
+    @conditional(recipe_validators)
+    @cache_anonymous_response
+    def retrieve(self, request, *args, **kwargs):
+        '''
+        Рецепт. Поддерживает условные запросы,
+        ответы анонимным пользователям кэшируются.
+        '''
+        return super().retrieve(request, *args, **kwargs)
+
     @action(
         detail=True, methods=['POST', 'DELETE'],
         permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def shopping_cart(self, request, pk):
         '''
         Удаляет или записывает в Корзину покупок юзера и рецепт.
         Доступно только авторизованным пользователям.
         '''
-        if request.method == 'DELETE':
-            user = request.user
-            result = get_object_or_404(ShoppingCart, user=user, recipe=pk)
-            if result:
-                result.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(status=status.HTTP_400_BAD_REQUEST)
-
-        serializers = ShoppingCartSerializer
-        user = request.user
-        if ShoppingCart.objects.filter(user=user, recipe=pk):
-            return Response(
-                {'errors': 'Рецепт уже в корзине'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        data = {'user': user.id, 'recipe': pk}
-        serializer = serializers(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return self.change_recipe(
+            request, int(pk), ShoppingCart, 'Рецепт уже в корзине'
+        )
 
     @action(
         detail=True, methods=['POST', 'DELETE'],
         permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def favorite(self, request, pk):
         '''
         Удаляет или записывает в Избранное юзера и рецепт.
         Доступно только авторизованным пользователям.
         '''
-        if request.method == 'DELETE':
-            user = request.user
-            result = get_object_or_404(Favorite, user=user, recipe=pk)
-            if result:
-                result.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        return self.change_recipe(
+            request, int(pk), Favorite, 'Рецепт уже в Избранном'
+        )
 
-        serializers = FavoriteSerializer
+    def change_recipe(self, request, pk, model, exists_error):
+        '''
+        Добавление (POST) или удаление (DELETE) рецепта в Избранном
+        или Корзине. Запись делается одним INSERT ... ON CONFLICT
+        DO NOTHING, удаление - одним DELETE ... RETURNING, поэтому
+        повторные и параллельные запросы не создают дублей.
+        '''
         user = request.user
-        if Favorite.objects.filter(user=user, recipe=pk):
+        if request.method == 'DELETE':
+            if not remove_links(model, user, [pk]):
+                raise Http404
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        recipe = get_object_or_404(Recipe, pk=pk)
+        if not add_links(model, user, [recipe.pk]):
             return Response(
-                {'errors': 'Рецепт уже в Избранном'},
+                {'errors': exists_error},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        data = {'user': user.id, 'recipe': pk}
-        serializer = serializers(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer = RecipeShortSerializer(
+            recipe, context={'request': request}
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(
+        detail=False, methods=['POST', 'DELETE'], url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    @query_budget(9)
+    @transaction.atomic
+    def shopping_cart_bulk(self, request):
+        '''
+        Добавляет в Корзину покупок или удаляет из неё
+        несколько рецептов: {"recipes": [id, ...]}.
+        Возвращает результат по каждому id.
+        Доступно только авторизованным пользователям.
+        '''
+        return self.change_recipes(
+            request, ShoppingCart,
+            'Рецепт уже в корзине', 'Рецепта нет в корзине'
+        )
+
+    @action(
+        detail=False, methods=['POST', 'DELETE'], url_path='favorite',
+        permission_classes=[IsAuthenticated]
+    )
+    @query_budget(5)
+    @transaction.atomic
+    def favorite_bulk(self, request):
+        '''
+        Добавляет в Избранное или удаляет из него
+        несколько рецептов: {"recipes": [id, ...]}.
+        Возвращает результат по каждому id.
+        Доступно только авторизованным пользователям.
+        '''
+        return self.change_recipes(
+            request, Favorite,
+            'Рецепт уже в Избранном', 'Рецепта нет в Избранном'
+        )
+
+    def change_recipes(self, request, model, exists_error, missing_error):
+        '''
+        Массовое добавление (POST) или удаление (DELETE) рецептов
+        в Избранном или Корзине: один INSERT ... ON CONFLICT DO NOTHING
+        или один DELETE на весь список id.
+        '''
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipes = list(dict.fromkeys(serializer.validated_data['recipes']))
+        user = request.user
+        found = set(Recipe.objects.filter(
+            pk__in=recipes
+        ).values_list('pk', flat=True))
+        if request.method == 'POST':
+            changed = set(add_links(model, user, found))
+            done, error = 'added', exists_error
+        else:
+            changed = set(remove_links(model, user, recipes))
+            done, error = 'removed', missing_error
+        results = []
+        for pk in recipes:
+            if pk not in found:
+                result = {'status': 'not_found', 'errors': 'Рецепт не найден'}
+            elif pk in changed:
+                result = {'status': done}
+            else:
+                result = {'status': 'skipped', 'errors': error}
+            results.append({'id': pk, **result})
+        return Response({'recipes': results})
+
     @action(
         detail=False, methods=['GET'],
         permission_classes=[IsAuthenticated]
     )
+    @query_budget(1)
     def download_shopping_cart(self, request):
         '''
         Получает ингредиенты из Корзины покупок пользователя,
-        суммирует количество ингредиентов, и отправляет их в виде txt-файла.
+        суммирует количество ингредиентов и отдаёт их файлом
+        в формате из параметра type: txt (по умолчанию), csv, json или pdf.
+        Файл формируется потоково, по мере чтения строк из БД,
+        запросы потока проверяются отдельным лимитом.
         Доступно только авторизованным пользователям.
         '''
         user = self.request.user
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in WRITERS:
+            return Response(
+                {'errors': f'Поддерживаемые форматы: {", ".join(WRITERS)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         if not user.carts.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        ingredients = user.carts.select_related('user', 'recipe').values(
-            ingredient=F('recipe__ingredients__name'),
-            measurement_unit=F('recipe__ingredients__measurement_unit')
-        ).annotate(amount=Sum('recipe__ingredients__ingredient__amount'))
-        shopping_list = (
-            f'Список покупок пользователя {user.username}\n'
-        )
-        for ingr in ingredients:
-            shopping_list += (
-                f'{ingr["ingredient"]}: '
-                f'{ingr["amount"]} '
-                f'{ingr["measurement_unit"]}\n'
+        writer, content_type, extension = WRITERS[file_type]
+        try:
+            content = writer(user, shopping_list_rows(user))
+        except FONT_ERRORS:
+            logger.exception('Не удалось загрузить шрифт для PDF')
+            return Response(
+                {'errors': 'Выгрузка в PDF временно недоступна'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
+        response = StreamingHttpResponse(
+            budgeted_stream(
+                'RecipeViewSet.download_shopping_cart (поток)', 1, content
+            ),
+            content_type=content_type
+        )
+        filename = f'{user.username}_shopping_list.{extension}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
@@ -0,0 +1,126 @@
+import pytest
+from django.core.cache import caches
+from django.core.files.storage import FileSystemStorage
+from django.db import connection
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings, tmp_path, monkeypatch):
+    '''
+    Превышение query_budget - ошибка, файлы и исходные загрузки фото
+    пишутся во временный каталог, кэш очищается.
+    '''
+    settings.QUERY_BUDGET_RAISE = True
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.IMAGE_UPLOADS_ROOT = str(tmp_path / 'uploads')
+    # Хранилище загрузок создаётся при объявлении поля.
+    monkeypatch.setattr(
+        Recipe._meta.get_field('image_upload'),
+        'storage',
+        FileSystemStorage(location=settings.IMAGE_UPLOADS_ROOT),
+    )
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def postgresql_only(request):
+    '''Тесты с меткой postgresql пропускаются на других СУБД.'''
+    if (
+        request.node.get_closest_marker('postgresql')
+        and connection.vendor != 'postgresql'
+    ):
+        pytest.skip('нужен PostgreSQL')
+
+
+@pytest.fixture
+def make_user(db):
+    '''Создаёт пользователя с уникальным username.'''
+    counter = iter(range(1, 10 ** 9))
+
+    def make(**fields):
+        number = next(counter)
+        fields.setdefault('username', f'user{number}')
+        fields.setdefault('email', f'user{number}@example.com')
+        fields.setdefault('first_name', 'Имя')
+        fields.setdefault('last_name', 'Фамилия')
+        return User.objects.create_user(password='Pass12345!x', **fields)
+
+    return make
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user()
+
+
+def api_client(user=None):
+    '''Клиент API, авторизованный токеном user.'''
+    client = APIClient()
+    if user is not None:
+        token, created = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def make_client(db):
+    return api_client
+
+
+@pytest.fixture
+def user_client(user):
+    return api_client(user)
+
+
+@pytest.fixture
+def staff_client(make_user):
+    return api_client(make_user(is_staff=True))
+
+
+@pytest.fixture
+def anonymous_client():
+    return api_client()
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in (
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'lunch'),
+        )
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit=unit)
+        for name, unit in (('мука', 'г'), ('молоко', 'мл'), ('яйца', 'шт'))
+    ]
+
+
+@pytest.fixture
+def make_recipe(tags, ingredients):
+    '''Создаёт рецепт со всеми тегами и ингредиентами.'''
+
+    def make(author, **fields):
+        fields.setdefault('name', f'Рецепт {Recipe.objects.count() + 1}')
+        fields.setdefault('text', 'Описание')
+        fields.setdefault('cooking_time', 10)
+        fields.setdefault('image', 'recipes_images/recipe.jpg')
+        recipe = Recipe.objects.create(author=author, **fields)
+        recipe.tags.set(tags)
+        IngredientAmount.objects.bulk_create(
+            IngredientAmount(recipe=recipe, ingredients=ingredient, amount=10)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    return make
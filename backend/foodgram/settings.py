@@ -107,6 +107,31 @@ else:
         }
     }
 
+# Для одного узла достаточно локального кэша в памяти процесса.
+# Для нескольких узлов (или нескольких воркеров gunicorn) укажите общий
+# бэкенд, например
+# CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache
+# и CACHE_LOCATION=memcached:11211.
+# С локальным кэшем manage.py cache_stats не видит счётчики веб-процессов,
+# их показывает /api/cache_stats/ (по процессу, обработавшему запрос).
+# Общий бэкенд нужен и при запущенном воркере process_images: версии
+# рецептов, которые он повышает, иначе не доходят до веб-процессов.
+# Поэтому с локальным кэшем ответы с необработанными фото не кэшируются,
+# а ETag рецепта зависит от состояния фото, а не только от версии в кэше.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'foodgram'),
+    }
+}
+
+# Кэш ответов анонимным пользователям (api.cache)
+RECIPES_CACHE_ALIAS = 'default'
+RECIPES_CACHE_TIMEOUT = 60 * 5
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -119,6 +144,24 @@ REST_FRAMEWORK = {
     )
 }
 
+# Превышение лимита запросов к БД (api.decorators.query_budget)
+# пишется в лог, а при QUERY_BUDGET_RAISE = True вызывает исключение.
+QUERY_BUDGET_RAISE = os.getenv('QUERY_BUDGET_RAISE', 'False') == 'True'
+
+# TrueType-шрифт с кириллицей для выгрузки списка покупок в PDF.
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    'SHOPPING_LIST_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Исходные загрузки фото рецептов до обработки (process_images).
+# Каталог не раздаётся nginx и должен быть общим для web и воркера.
+IMAGE_UPLOADS_ROOT = os.getenv(
+    'IMAGE_UPLOADS_ROOT', os.path.join(BASE_DIR, 'uploads')
+)
+# Через сколько секунд фото, взятое воркером, можно взять повторно.
+IMAGE_JOB_TIMEOUT = int(os.getenv('IMAGE_JOB_TIMEOUT', 300))
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 AUTH_USER_MODEL = 'users.User'
@@ -53,8 +53,10 @@ class RecipeAdmin(admin.ModelAdmin):
         'author',
         'text',
         'image',
+        'image_status',
         'cooking_time',
-        'favorites_count'
+        'favorites_count',
+        'carts_count',
     )
     list_display_links = (
         'id',
@@ -65,13 +67,8 @@ class RecipeAdmin(admin.ModelAdmin):
         'cooking_time',
         'favorites_count'
     )
-    list_filter = ('name', 'author', 'tags',)
-
-    def favorites_count(self, obj):
-        '''
-        Выводит общее число добавлений конкретного рецепта(obj) в Избранное.
-        '''
-        return obj.user_favorites.count()
+    list_filter = ('name', 'author', 'tags', 'image_status')
+    readonly_fields = ('favorites_count', 'carts_count', 'image_status')
 
 
 @admin.register(TagRecipe)
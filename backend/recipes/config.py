@@ -27,6 +27,20 @@ MEASURMENTS_UNITS = (
     ('упаковка', 'упаковка'),
 )
 
+# Единицы, которые при суммировании списка покупок приводятся
+# к базовой: единица -> (базовая единица, множитель).
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+}
+
+# Крупные единицы для вывода суммы в базовой единице:
+# базовая единица -> ((крупная единица, множитель), ...) по убыванию.
+DISPLAY_UNITS = {
+    'г': (('кг', 1000),),
+    'мл': (('л', 1000),),
+}
+
 HEX_COLORS = (
     ('#E26C2D', '#E26C2D'),
     ('#c4a623', '#c4a623'),
@@ -42,3 +56,37 @@ HEX_COLORS = (
     ('#098765', '#098765'),
     ('#ff4f1e', '#ff4f1e'),
 )
+
+# Уменьшенные копии фото рецепта: вариант -> наибольшие ширина и высота.
+IMAGE_VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+
+# Форматы копий: ключ в ответе API -> (формат Pillow, расширение,
+# параметры сохранения).
+IMAGE_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {
+        'quality': 82, 'optimize': True, 'progressive': True,
+    }),
+}
+
+# Наибольший размер перекодированного оригинала фото.
+IMAGE_MAX_SIZE = (2560, 2560)
+
+# Форматы, которые принимает обработчик фото.
+IMAGE_INPUT_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Состояние обработки фото рецепта.
+IMAGE_PENDING = 'pending'
+IMAGE_PROCESSING = 'processing'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+IMAGE_STATUSES = (
+    (IMAGE_PENDING, 'Ожидает обработки'),
+    (IMAGE_PROCESSING, 'Обрабатывается'),
+    (IMAGE_READY, 'Готово'),
+    (IMAGE_FAILED, 'Ошибка обработки'),
+)
@@ -0,0 +1,47 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    '''Подзапрос: число строк model, ссылающихся на запись через field.'''
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ),
+        0,
+    )
+
+
+def get_counters(recipe, user, favorite, shopping_cart, subscribe):
+    '''
+    Денормализованные счётчики: (модель, поле, выражение для пересчёта).
+    Модели передаются явно, чтобы функцию можно было
+    использовать и в миграциях.
+    '''
+    return (
+        (recipe, 'favorites_count', count_of(favorite, 'recipe')),
+        (recipe, 'carts_count', count_of(shopping_cart, 'recipe')),
+        (user, 'recipes_count', count_of(recipe, 'author')),
+        (user, 'followers_count', count_of(subscribe, 'author')),
+    )
+
+
+def repair_counters(counters):
+    '''
+    Находит записи с неверными счётчиками и пересчитывает их
+    одним UPDATE на каждый счётчик.
+    Возвращает число исправленных записей по каждому счётчику.
+    '''
+    repaired = {}
+    for model, field, expression in counters:
+        stale = model.objects.annotate(
+            actual=expression
+        ).exclude(**{field: F('actual')})
+        repaired[f'{model.__name__}.{field}'] = model.objects.filter(
+            pk__in=stale.values('pk')
+        ).update(**{field: expression})
+    return repaired
@@ -0,0 +1,250 @@
+import datetime
+import os
+import random
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .counters import get_counters, repair_counters
+from .loaders import load_ingredients, load_tags
+from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                     ShoppingCart, ShoppingListItem, Subscribe, Tag, TagRecipe)
+from .shopping_list import rebuild
+
+User = get_user_model()
+
+CSV_DATA = os.path.join(settings.BASE_DIR, 'data')
+# Сколько строк записывается одним INSERT (с учётом лимита параметров БД).
+INSERT_BATCH_SIZE = 1000
+# Все сгенерированные рецепты ссылаются на один файл изображения.
+IMAGE = 'recipes_images/generated.png'
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Олег', 'Ольга', 'Пётр', 'Софья')
+LAST_NAMES = ('Иванов', 'Петров', 'Смирнов', 'Соколов', 'Кузнецов')
+
+
+class Zipf:
+    '''
+    Выбор элементов с вероятностью, обратной рангу в степени exponent.
+    Ранги назначаются случайно, чтобы популярность не зависела от id.
+    '''
+
+    def __init__(self, rng, items, exponent):
+        self.rng = rng
+        self.items = list(items)
+        rng.shuffle(self.items)
+        self.cum_weights = list(accumulate(
+            1 / rank ** exponent for rank in range(1, len(self.items) + 1)
+        ))
+
+    def choice(self):
+        return self.rng.choices(self.items, cum_weights=self.cum_weights)[0]
+
+    def sample(self, count):
+        '''До count разных элементов: популярные могут выпасть повторно.'''
+        ranks = self.rng.choices(
+            range(len(self.items)), cum_weights=self.cum_weights, k=count
+        )
+        return [self.items[rank] for rank in sorted(set(ranks))]
+
+
+def insert_rows(cursor, model, fields, rows):
+    '''
+    Вставляет rows - кортежи значений полей fields, уже приведённых
+    к виду для БД, многострочными INSERT ... ON CONFLICT DO NOTHING.
+    Остальные колонки получают значения по умолчанию из модели.
+    Возвращает число переданных строк.
+    '''
+    now = timezone.now()
+    defaults = []
+    for field in model._meta.concrete_fields:
+        if field.name in fields or field.primary_key:
+            continue
+        if getattr(field, 'auto_now', False) or getattr(
+            field, 'auto_now_add', False
+        ):
+            value = now
+        else:
+            value = field.get_default()
+        defaults.append(
+            (field.column, field.get_db_prep_save(value, connection))
+        )
+    quote = connection.ops.quote_name
+    columns = [model._meta.get_field(name).column for name in fields]
+    columns += [column for column, value in defaults]
+    constants = tuple(value for column, value in defaults)
+    batch_size = INSERT_BATCH_SIZE
+    if connection.features.max_query_params:
+        batch_size = min(
+            batch_size, connection.features.max_query_params // len(columns)
+        )
+    placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    sql = (
+        f'INSERT INTO {quote(model._meta.db_table)} '
+        f'({", ".join(quote(column) for column in columns)}) VALUES '
+    )
+    inserted = 0
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return inserted
+        cursor.execute(
+            sql + ', '.join([placeholder] * len(batch))
+            + ' ON CONFLICT DO NOTHING',
+            [value for row in batch for value in row + constants],
+        )
+        inserted += len(batch)
+
+
+def next_id(model):
+    return (model.objects.aggregate(pk=Max('pk'))['pk'] or 0) + 1
+
+
+def spread(rng, average):
+    '''Случайное число от 0 до 2 * average со средним average.'''
+    return rng.randint(0, 2 * average)
+
+
+def load_catalogs():
+    '''
+    id ингредиентов и тегов; справочники загружаются из backend/data,
+    если они пусты. Порядок не зависит от id, назначенных при загрузке.
+    '''
+    if not Ingredient.objects.exists():
+        load_ingredients(os.path.join(CSV_DATA, 'ingredients.csv'))
+    if not Tag.objects.exists():
+        load_tags(os.path.join(CSV_DATA, 'tags.csv'))
+    return (
+        list(Ingredient.objects.order_by(
+            'name', 'measurement_unit'
+        ).values_list('pk', flat=True)),
+        list(Tag.objects.order_by('slug').values_list('pk', flat=True)),
+    )
+
+
+class Dataset:
+    '''
+    Строки синтетических таблиц. Все значения берутся из одного
+    генератора случайных чисел, поэтому этапы нужно обходить по порядку.
+    '''
+
+    def __init__(self, users, recipes, seed, exponent, password):
+        self.rng = random.Random(seed)
+        self.ingredient_ids, self.tag_ids = load_catalogs()
+        self.first_user = next_id(User)
+        first_recipe = next_id(Recipe)
+        self.user_ids = range(self.first_user, self.first_user + users)
+        self.recipe_ids = range(first_recipe, first_recipe + recipes)
+        # Хэш считается один раз: это самая медленная часть создания юзера.
+        self.password = make_password(password)
+        self.now = timezone.now()
+        self.authors = Zipf(self.rng, self.user_ids, exponent)
+        self.recipes = Zipf(self.rng, self.recipe_ids, exponent)
+        self.ingredients = Zipf(self.rng, self.ingredient_ids, exponent)
+
+    def users_rows(self):
+        for pk in self.user_ids:
+            yield (
+                pk, f'user{pk}', f'user{pk}@example.com',
+                self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES),
+                self.password,
+            )
+
+    def recipes_rows(self):
+        pub_date = Recipe._meta.get_field('pub_date')
+        for pk in self.recipe_ids:
+            author = self.authors.choice()
+            published = self.now - datetime.timedelta(
+                days=365 * self.rng.random()
+            )
+            yield (
+                pk, author, f'Рецепт {pk}', f'Описание рецепта {pk}',
+                self.rng.randint(1, 240), IMAGE,
+                pub_date.get_db_prep_save(published, connection),
+            )
+
+    def amounts_rows(self, average):
+        for recipe in self.recipe_ids:
+            count = max(1, spread(self.rng, average))
+            for ingredient in self.ingredients.sample(count):
+                yield recipe, ingredient, self.rng.randint(1, 500)
+
+    def tags_rows(self):
+        for recipe in self.recipe_ids:
+            count = self.rng.randint(1, min(3, len(self.tag_ids)))
+            for tag in self.rng.sample(self.tag_ids, count):
+                yield tag, recipe
+
+    def links_rows(self, popular, average):
+        '''Связи пользователей с популярными рецептами или авторами.'''
+        for user in self.user_ids:
+            for pk in popular.sample(spread(self.rng, average)):
+                if pk != user or popular is not self.authors:
+                    yield user, pk
+
+
+@transaction.atomic
+def generate_dataset(users, recipes, ingredients=8, favorites=20, carts=3,
+                     subscriptions=10, seed=0, exponent=1.1, password=None,
+                     report=print):
+    '''
+    Генерирует пользователей, рецепты и связи между ними одной
+    транзакцией. Авторы, рецепты и ингредиенты выбираются по закону
+    Ципфа: немногие получают большую часть подписок, избранного
+    и покупок. При одинаковом seed и исходной базе данные совпадают.
+    Записи вставляются в обход ORM, поэтому в конце пересчитываются
+    счётчики и списки покупок новых пользователей.
+    report(этап, число строк) вызывается после каждого этапа.
+    '''
+    data = Dataset(users, recipes, seed, exponent, password)
+    stages = (
+        (User, (
+            'id', 'username', 'email', 'first_name', 'last_name', 'password',
+        ), data.users_rows()),
+        (Recipe, (
+            'id', 'author', 'name', 'text', 'cooking_time', 'image',
+            'pub_date',
+        ), data.recipes_rows()),
+        (IngredientAmount, ('recipe', 'ingredients', 'amount'),
+         data.amounts_rows(ingredients)),
+        (TagRecipe, ('tag', 'recipe'), data.tags_rows()),
+        (Favorite, ('user', 'recipe'),
+         data.links_rows(data.recipes, favorites)),
+        (ShoppingCart, ('user', 'recipe'),
+         data.links_rows(data.recipes, carts)),
+        (Subscribe, ('user', 'author'),
+         data.links_rows(data.authors, subscriptions)),
+    )
+    stats = {}
+    with connection.cursor() as cursor:
+        for model, fields, rows in stages:
+            stats[model.__name__] = insert_rows(cursor, model, fields, rows)
+            report(model.__name__, stats[model.__name__])
+        # id заданы явно, на PostgreSQL нужно сдвинуть последовательности.
+        for sql in connection.ops.sequence_reset_sql(
+            no_style(), [User, Recipe]
+        ):
+            cursor.execute(sql)
+        # Статистика планировщика устарела для только что вставленных
+        # строк: без неё пересчёт счётчиков может перебирать таблицы связей.
+        if connection.vendor == 'postgresql':
+            cursor.execute('ANALYZE ' + ', '.join(
+                connection.ops.quote_name(model._meta.db_table)
+                for model, fields, rows in stages
+            ))
+    repaired = repair_counters(
+        get_counters(Recipe, User, Favorite, ShoppingCart, Subscribe)
+    )
+    report('counters', sum(repaired.values()))
+    stats[ShoppingListItem.__name__] = rebuild(
+        ShoppingCart, ShoppingListItem,
+        users=User.objects.filter(pk__gte=data.first_user).values('pk'),
+    )
+    report(ShoppingListItem.__name__, stats[ShoppingListItem.__name__])
+    return stats
@@ -0,0 +1,85 @@
+import datetime
+import logging
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .config import IMAGE_FAILED, IMAGE_PENDING, IMAGE_PROCESSING, IMAGE_READY
+from .images import IMAGE_ERRORS, process_image
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Сколько рецептов из очереди перебирается за одну попытку захвата.
+CLAIM_CANDIDATES = 10
+
+
+def claim_job(timeout):
+    '''
+    Берёт в обработку рецепт с необработанным фото или с фото,
+    которое другой воркер не обработал за timeout секунд.
+    Захват - UPDATE с условием на прежнее состояние, поэтому
+    из нескольких воркеров рецепт достаётся только одному.
+    Возвращает (id рецепта, время захвата) или None.
+    '''
+    now = timezone.now()
+    candidates = Recipe.objects.filter(
+        Q(image_status=IMAGE_PENDING)
+        | Q(
+            image_status=IMAGE_PROCESSING,
+            image_claimed_at__lt=now - datetime.timedelta(seconds=timeout),
+        )
+    ).order_by('image_claimed_at', 'pk').values_list(
+        'pk', 'image_status', 'image_claimed_at'
+    )[:CLAIM_CANDIDATES]
+    for pk, status, claimed_at in candidates:
+        if Recipe.objects.filter(
+            pk=pk, image_status=status, image_claimed_at=claimed_at
+        ).update(image_status=IMAGE_PROCESSING, image_claimed_at=now):
+            return pk, now
+    return None
+
+
+def process_job(pk, claimed_at):
+    '''
+    Проверяет и перекодирует фото рецепта, готовит его копии.
+    Результат записывается, только если за время обработки
+    фото не заменили и рецепт не взял другой воркер; вместе с ним
+    обновляется modified, от которого зависит ETag рецепта.
+    Возвращает итоговое состояние или None, если результат устарел.
+    '''
+    recipe = Recipe.objects.filter(pk=pk).first()
+    if recipe is None:
+        return None
+    source = recipe.image_upload or recipe.image
+    fields = {'image_status': IMAGE_READY}
+    try:
+        with source.open('rb'):
+            fields['image'], fields['image_variants'] = process_image(source)
+    except IMAGE_ERRORS as error:
+        logger.warning('Фото рецепта %s не обработано: %s', pk, error)
+        fields['image_status'] = IMAGE_FAILED
+    updated = Recipe.objects.filter(
+        pk=pk, image_status=IMAGE_PROCESSING, image_claimed_at=claimed_at
+    ).update(
+        image_claimed_at=None,
+        image_upload='',
+        modified=timezone.now(),
+        **fields,
+    )
+    upload = recipe.image_upload
+    if upload and (updated or not Recipe.objects.filter(
+        image_upload=upload.name
+    ).exists()):
+        upload.delete(save=False)
+    return fields['image_status'] if updated else None
+
+
+def enqueue_missing():
+    '''
+    Ставит в очередь рецепты с фото, но без копий,
+    например, загруженные import_recipes или generate_dataset.
+    '''
+    return Recipe.objects.filter(
+        image_status=IMAGE_READY, image_variants={}
+    ).exclude(image='').update(image_status=IMAGE_PENDING)
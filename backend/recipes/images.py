@@ -0,0 +1,84 @@
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .config import (IMAGE_FORMATS, IMAGE_INPUT_FORMATS, IMAGE_MAX_SIZE,
+                     IMAGE_VARIANTS)
+from .storage import image_storage
+
+IMAGES_DIR = 'recipes_images'
+VARIANTS_DIR = 'recipes_images/variants'
+# Ошибки Pillow при повреждённых или слишком больших изображениях.
+IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+
+def open_image(image_file):
+    '''
+    Открывает и полностью декодирует фото, поворачивает по EXIF
+    и приводит к RGB, подкладывая белый фон под прозрачные области.
+    JPEG сразу декодируется в уменьшенном размере, если это возможно.
+    Неподдерживаемый формат - ValueError, повреждённый файл - OSError.
+    '''
+    image_file.seek(0)
+    image = Image.open(image_file)
+    if image.format not in IMAGE_INPUT_FORMATS:
+        raise ValueError(f'Неподдерживаемый формат: {image.format}')
+    image.draft('RGB', IMAGE_MAX_SIZE)
+    image = ImageOps.exif_transpose(image)
+    image.load()
+    if image.mode in ('RGBA', 'LA', 'PA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    if image.mode != 'RGB':
+        return image.convert('RGB')
+    return image
+
+
+def encode(image, key):
+    '''Фото в формате IMAGE_FORMATS[key], без метаданных исходника.'''
+    image_format, extension, params = IMAGE_FORMATS[key]
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+def save_content(data, extension, directory=VARIANTS_DIR):
+    '''Сохраняет файл в хранилище фото, имя - хэш содержимого.'''
+    return image_storage.save(
+        f'{directory}/image.{extension}', ContentFile(data)
+    )
+
+
+def make_variants(image):
+    '''
+    Готовит копии фото для каждого варианта из IMAGE_VARIANTS
+    во всех форматах из IMAGE_FORMATS. Фото не увеличиваются.
+    Возвращает {вариант: {'width', 'height', формат: имя файла}}.
+    '''
+    variants = {}
+    # От большего варианта к меньшему: каждый уменьшается из предыдущего.
+    for name, size in sorted(
+        IMAGE_VARIANTS.items(), key=lambda item: item[1], reverse=True
+    ):
+        image = image.copy()
+        image.thumbnail(size, Image.Resampling.LANCZOS)
+        variant = {'width': image.width, 'height': image.height}
+        for key, (image_format, extension, params) in IMAGE_FORMATS.items():
+            variant[key] = save_content(encode(image, key), extension)
+        variants[name] = variant
+    return {name: variants[name] for name in IMAGE_VARIANTS}
+
+
+def process_image(image_file):
+    '''
+    Проверяет загруженное фото и перекодирует его в JPEG размером
+    не больше IMAGE_MAX_SIZE, отбрасывая EXIF и другие метаданные.
+    Возвращает имя сохранённого фото и его копии (make_variants).
+    '''
+    image = open_image(image_file)
+    image.thumbnail(IMAGE_MAX_SIZE, Image.Resampling.LANCZOS)
+    name = save_content(encode(image, 'jpeg'), 'jpg', IMAGES_DIR)
+    return name, make_variants(image)
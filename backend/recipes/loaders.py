@@ -0,0 +1,201 @@
+import csv
+import io
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Ingredient, Tag
+
+# Сколько строк CSV обрабатывается за раз.
+CHUNK_SIZE = 5000
+# Сколько строк записывается одним INSERT (не больше 999 параметров).
+INSERT_BATCH_SIZE = 400
+
+
+def read_chunks(path, columns, size=CHUNK_SIZE, check=None):
+    '''
+    Читает CSV порциями по size строк, не загружая файл целиком.
+    Пустые строки пропускаются, значения очищаются от пробелов.
+    check проверяет очищенную строку и сообщает об ошибке ValueError.
+    '''
+    with open(path, encoding='utf-8', newline='') as data:
+        reader = csv.reader(data)
+        chunk = []
+        for row in reader:
+            if not row:
+                continue
+            try:
+                if len(row) != columns:
+                    raise ValueError(
+                        f'ожидается колонок - {columns}, '
+                        f'получено - {len(row)}'
+                    )
+                row = tuple(value.strip() for value in row)
+                if check is not None:
+                    check(row)
+            except ValueError as error:
+                raise ValueError(f'Строка {reader.line_num}: {error}')
+            chunk.append(row)
+            if len(chunk) == size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def check_ingredient(row):
+    '''Название и единица измерения непустые и умещаются в поля.'''
+    for field, value in zip(('name', 'measurement_unit'), row):
+        max_length = Ingredient._meta.get_field(field).max_length
+        if not value:
+            raise ValueError(f'{field}: пустое значение')
+        if len(value) > max_length:
+            raise ValueError(f'{field}: длиннее {max_length} символов')
+
+
+def update_units(rows):
+    '''
+    Меняет единицу измерения ингредиентов, которые в БД есть
+    в единственном варианте, а в порции CSV указаны с одной другой
+    единицей. Ссылки рецептов на ингредиент при этом сохраняются.
+    '''
+    units = defaultdict(set)
+    for name, unit in rows:
+        units[name].add(unit)
+    stored = defaultdict(list)
+    for pk, name, unit in Ingredient.objects.filter(
+        name__in=units
+    ).order_by().values_list('pk', 'name', 'measurement_unit'):
+        stored[name].append((pk, unit))
+    now = timezone.now()
+    changed = []
+    for name, new_units in units.items():
+        if len(new_units) != 1 or len(stored[name]) != 1:
+            continue
+        (pk, unit), = stored[name]
+        new_unit, = new_units
+        if unit != new_unit:
+            changed.append(Ingredient(
+                pk=pk, measurement_unit=new_unit, modified=now
+            ))
+    Ingredient.objects.bulk_update(changed, ['measurement_unit', 'modified'])
+    return len(changed)
+
+
+def insert_ingredients(cursor, rows):
+    '''
+    Вставляет ингредиенты пачками по INSERT_BATCH_SIZE строк
+    запросом INSERT ... ON CONFLICT DO NOTHING. Запрос собирается
+    вручную: для миллиона строк сборка через bulk_create
+    занимает больше времени, чем сама запись.
+    '''
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    rows = list(rows)
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        batch = rows[start:start + INSERT_BATCH_SIZE]
+        values = ', '.join(['(%s, %s, CURRENT_TIMESTAMP)'] * len(batch))
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit, modified) '
+            f'VALUES {values} ON CONFLICT DO NOTHING',
+            [value for row in batch for value in row],
+        )
+
+
+@transaction.atomic
+def load_ingredients(path, replace_units=False):
+    '''
+    Загружает ингредиенты из CSV порциями одной транзакцией.
+    Возвращает число строк, добавленных и изменённых ингредиентов.
+    '''
+    stats = {'rows': 0, 'created': 0, 'updated': 0}
+    before = Ingredient.objects.count()
+    with connection.cursor() as cursor:
+        for chunk in read_chunks(path, 2, check=check_ingredient):
+            stats['rows'] += len(chunk)
+            rows = set(chunk)
+            if replace_units:
+                stats['updated'] += update_units(rows)
+            insert_ingredients(cursor, rows)
+    stats['created'] = Ingredient.objects.count() - before
+    return stats
+
+
+@transaction.atomic
+def copy_ingredients(path, replace_units=False):
+    '''
+    Загрузка ингредиентов для PostgreSQL: строки, проверенные
+    как при обычной загрузке, порциями передаются командой COPY
+    во временную таблицу, откуда ингредиенты переносятся одним
+    INSERT ... ON CONFLICT DO NOTHING. Ошибки драйвера при COPY
+    приводятся к исключениям django.db.
+    '''
+    table = connection.ops.quote_name(Ingredient._meta.db_table)
+    stats = {'rows': 0, 'created': 0, 'updated': 0}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'CREATE TEMP TABLE ingredient_staging '
+            '(name text, measurement_unit text) ON COMMIT DROP'
+        )
+        for chunk in read_chunks(path, 2, check=check_ingredient):
+            stats['rows'] += len(chunk)
+            data = io.StringIO()
+            csv.writer(data).writerows(chunk)
+            data.seek(0)
+            with connection.wrap_database_errors:
+                cursor.copy_expert(
+                    'COPY ingredient_staging FROM STDIN WITH (FORMAT csv)',
+                    data,
+                )
+        if replace_units:
+            cursor.execute(
+                f'UPDATE {table} AS i '
+                f'SET measurement_unit = s.unit, modified = now() '
+                f'FROM (SELECT name, min(measurement_unit) AS unit '
+                f'FROM ingredient_staging GROUP BY name '
+                f'HAVING count(DISTINCT measurement_unit) = 1) AS s '
+                f'WHERE i.name = s.name AND i.measurement_unit <> s.unit '
+                f'AND NOT EXISTS (SELECT 1 FROM {table} AS o '
+                f'WHERE o.name = i.name AND o.id <> i.id)'
+            )
+            stats['updated'] = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {table} (name, measurement_unit, modified) '
+            f'SELECT DISTINCT name, measurement_unit, now() '
+            f'FROM ingredient_staging ON CONFLICT DO NOTHING'
+        )
+        stats['created'] = cursor.rowcount
+    return stats
+
+
+@transaction.atomic
+def load_tags(path):
+    '''
+    Загружает теги порциями: новые добавляются через bulk_create,
+    у существующих (по slug) обновляются название и цвет.
+    '''
+    stats = {'rows': 0, 'created': 0, 'updated': 0}
+    before = Tag.objects.count()
+    now = timezone.now()
+    for chunk in read_chunks(path, 3):
+        stats['rows'] += len(chunk)
+        tags = {slug: (name, color) for name, color, slug in chunk}
+        stored = Tag.objects.in_bulk(tags, field_name='slug')
+        changed = []
+        for slug, tag in stored.items():
+            if (tag.name, tag.color) != tags[slug]:
+                tag.name, tag.color = tags[slug]
+                tag.modified = now
+                changed.append(tag)
+        Tag.objects.bulk_update(changed, ['name', 'color', 'modified'])
+        Tag.objects.bulk_create(
+            [
+                Tag(name=name, color=color, slug=slug)
+                for slug, (name, color) in tags.items()
+                if slug not in stored
+            ],
+            ignore_conflicts=True,
+        )
+        stats['updated'] += len(changed)
+    stats['created'] = Tag.objects.count() - before
+    return stats
@@ -0,0 +1,95 @@
+import statistics
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+from api.views import RecipeViewSet
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+User = get_user_model()
+
+URL = '/api/recipes/'
+
+
+class Command(BaseCommand):
+    '''
+    Замеряет время страниц ленты рецептов с постраничной и курсорной
+    пагинацией. Страница N с курсором открывается по ссылкам next
+    от первой страницы, как её листает клиент. Данные для замера
+    готовит generate_dataset: для страницы 10000 нужно 60000 рецептов.
+    '''
+
+    help = 'measure recipe feed page latency with page and cursor pagination'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', default='1,10,100,1000,10000', type=str,
+            help='comma separated page numbers to measure',
+        )
+        parser.add_argument(
+            '--repeat', default=5, type=int,
+            help='requests per page, the median is reported',
+        )
+        parser.add_argument(
+            '--user', type=str,
+            help='username of the reader, the first user by default',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            pages = sorted({int(page) for page in options['pages'].split(',')})
+        except ValueError:
+            raise CommandError('--pages: номера страниц через запятую')
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        self.user = users.first()
+        if self.user is None:
+            raise CommandError('Нет пользователя, от имени которого читать')
+        self.view = RecipeViewSet.as_view({'get': 'list'})
+        self.repeat = options['repeat']
+        cursors = self.cursors(pages)
+        self.stdout.write(f'{"страница":>10} {"page":>12} {"cursor":>12}')
+        for page in pages:
+            if page not in cursors:
+                self.stdout.write(f'{page:>10} {"нет такой страницы":>25}')
+                continue
+            numbered = self.measure({'page': page})
+            cursor = self.measure(cursors[page])
+            self.stdout.write(
+                f'{page:>10} {numbered * 1000:>9.1f} мс '
+                f'{cursor * 1000:>9.1f} мс'
+            )
+
+    def get(self, params):
+        '''Ответ ленты; анонимные ответы кэшируются, поэтому читает юзер.'''
+        request = APIRequestFactory().get(URL, params)
+        force_authenticate(request, user=self.user)
+        response = self.view(request)
+        response.render()
+        return response
+
+    def measure(self, params):
+        '''Медиана времени ответа за repeat запросов, в секундах.'''
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            response = self.get(params)
+            timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{params}: {response.status_code}')
+        return statistics.median(timings)
+
+    def cursors(self, pages):
+        '''Параметры курсорных страниц pages, по ссылкам next.'''
+        params = {'pagination': 'cursor'}
+        cursors = {}
+        for page in range(1, max(pages) + 1):
+            if page in pages:
+                cursors[page] = params
+            link = self.get(params).data['next']
+            if link is None:
+                break
+            params = dict(parse_qsl(urlsplit(link).query))
+        return cursors
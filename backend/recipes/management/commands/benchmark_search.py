@@ -0,0 +1,165 @@
+import random
+import statistics
+import time
+from types import SimpleNamespace
+
+from api.cache import bump_version
+from api.filters import IngredientSearchFilter
+from api.search import get_ingredient_index, normalize
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.dataset import load_catalogs
+from recipes.models import Ingredient
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+ALPHABET = 'абвгдежзийклмнопрстуфхцчшщыэюя'
+
+# Прежний путь через БД: SearchFilter с search_fields = ('name',)
+# (icontains) и его вариант по началу названия (istartswith).
+DB_PATHS = {
+    'icontains': ('name',),
+    'istartswith': ('^name',),
+}
+
+
+class Command(BaseCommand):
+    '''
+    Сравнивает время автодополнения ингредиентов по индексу в памяти
+    (api.search) и прежним поиском в БД: медиана и p99 по запросам,
+    как их набирают в редакторе рецепта - начала названий, части слов
+    и начала с опечаткой. Справочник дополняется сгенерированными
+    названиями до --ingredients в транзакции, которая затем
+    откатывается.
+    '''
+
+    help = 'measure ingredient autocomplete latency: index vs database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients', default=20000, type=int,
+            help='catalog size, the bundled catalog is extended to it',
+        )
+        parser.add_argument(
+            '--queries', default=500, type=int,
+            help='queries of each kind',
+        )
+        parser.add_argument('--seed', default=0, type=int)
+
+    def handle(self, *args, **options):
+        if options['queries'] < 2:
+            raise CommandError('--queries: нужно хотя бы 2 запроса')
+        self.rng = random.Random(options['seed'])
+        with transaction.atomic():
+            names = self.fill_catalog(options['ingredients'])
+            bump_version('ingredients')
+            started = time.perf_counter()
+            get_ingredient_index()
+            self.stdout.write(
+                f'Ингредиентов: {len(names)}, индекс построен за '
+                f'{(time.perf_counter() - started) * 1000:.1f} мс'
+            )
+            queries = self.make_queries(names, options['queries'])
+            self.stdout.write(
+                f'{"путь":<12} {"запросы":<10} {"p50, мс":>9} {"p99, мс":>9}'
+            )
+            for path, search in self.paths():
+                for kind, texts in queries.items():
+                    p50, p99 = self.measure(search, texts)
+                    self.stdout.write(
+                        f'{path:<12} {kind:<10} {p50:>9.2f} {p99:>9.2f}'
+                    )
+            transaction.set_rollback(True)
+        bump_version('ingredients')
+
+    def fill_catalog(self, size):
+        '''
+        Дополняет справочник названиями из пар слов имеющихся
+        ингредиентов (повторная пара получает номер) до size записей,
+        возвращает все названия.
+        '''
+        load_catalogs()
+        existing = list(Ingredient.objects.values_list(
+            'name', 'measurement_unit'
+        ))
+        words = sorted({
+            word for name, unit in existing for word in name.split()
+        })
+        units = sorted({unit for name, unit in existing})
+        names = {name for name, unit in existing}
+        new = []
+        while len(names) < size:
+            name = f'{self.rng.choice(words)} {self.rng.choice(words)}'
+            if name in names:
+                # Пары слов маленького справочника быстро кончаются.
+                name = f'{name} {len(names)}'
+            names.add(name)
+            new.append(Ingredient(
+                name=name, measurement_unit=self.rng.choice(units)
+            ))
+        Ingredient.objects.bulk_create(new, batch_size=1000)
+        return sorted(names)
+
+    def make_queries(self, names, count):
+        '''Начала названий, начала слов внутри названий и опечатки.'''
+        queries = {'prefix': [], 'substring': [], 'typo': []}
+        for _ in range(count):
+            name = normalize(self.rng.choice(names))
+            queries['prefix'].append(
+                name[:self.rng.randint(1, min(8, len(name)))]
+            )
+            word = self.rng.choice(name.split()[1:] or [name[1:] or name])
+            queries['substring'].append(word[:self.rng.randint(3, 6)])
+            queries['typo'].append(self.typo(name[:self.rng.randint(5, 9)]))
+        return queries
+
+    def typo(self, text):
+        '''Перестановка соседних букв или замена одной буквы.'''
+        if len(text) < 2:
+            return text
+        position = self.rng.randrange(len(text) - 1)
+        if self.rng.random() < 0.5:
+            return (
+                text[:position] + text[position + 1] + text[position]
+                + text[position + 2:]
+            )
+        return (
+            text[:position] + self.rng.choice(ALPHABET)
+            + text[position + 1:]
+        )
+
+    def paths(self):
+        '''(название, функция поиска): индекс и варианты поиска в БД.'''
+        yield 'index', self.filtered(IngredientSearchFilter(), None)
+        for path, fields in DB_PATHS.items():
+            yield path, self.filtered(
+                SearchFilter(), SimpleNamespace(search_fields=fields)
+            )
+
+    def filtered(self, backend, view):
+        '''Поиск через бэкенд фильтрации, как в IngredientViewSet.'''
+
+        def search(request):
+            return backend.filter_queryset(
+                request, Ingredient.objects.all(), view
+            )
+
+        return search
+
+    def measure(self, search, texts):
+        '''Медиана и p99 времени поиска с загрузкой найденного, в мс.'''
+        factory = APIRequestFactory()
+        requests = [
+            Request(factory.get('/', {'name': text, 'search': text}))
+            for text in texts
+        ]
+        timings = []
+        for request in requests:
+            started = time.perf_counter()
+            list(search(request))
+            timings.append((time.perf_counter() - started) * 1000)
+        return (
+            statistics.median(timings),
+            statistics.quantiles(timings, n=100)[98],
+        )
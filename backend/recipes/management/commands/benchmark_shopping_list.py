@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from api.exports import shopping_list_rows
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from recipes.models import IngredientAmount, Recipe, ShoppingCart
+from recipes.units import merge_units
+from recipes.user_lists import add_links
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    '''
+    Замеряет сборку списка покупок: прежнюю агрегацию Sum по ингредиентам
+    рецептов Корзины с группировкой по (название, единица), её же
+    со сложением совместимых единиц (merge_units) и текущий путь -
+    чтение таблицы списка покупок с merge_units, а также отдельно
+    стоимость merge_units. С --recipes в Корзину пользователя
+    в откатываемой транзакции добавляются рецепты с наибольшим числом
+    ингредиентов, например, из generate_dataset.
+    '''
+
+    help = 'measure shopping list aggregation with and without unit merging'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=str,
+            help='username of the cart owner, the first user by default',
+        )
+        parser.add_argument(
+            '--recipes', default=0, type=int,
+            help='recipes to put in the cart for the measurement',
+        )
+        parser.add_argument(
+            '--repeat', default=10, type=int,
+            help='runs of each variant, the median is reported',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нет пользователя для замера')
+        self.repeat = options['repeat']
+        with transaction.atomic():
+            if options['recipes']:
+                add_links(ShoppingCart, user, Recipe.objects.annotate(
+                    lines=Count('ingredient')
+                ).order_by('-lines', 'pk').values_list(
+                    'pk', flat=True
+                )[:options['recipes']])
+            self.report(user)
+            transaction.set_rollback(True)
+
+    def report(self, user):
+        recipes = ShoppingCart.objects.filter(user=user).count()
+        cart_lines = IngredientAmount.objects.filter(
+            recipe__carts__user=user
+        ).count()
+        grouped = list(self.orm_sum(user))
+        self.stdout.write(
+            f'Рецептов в Корзине: {recipes}, строк ингредиентов: '
+            f'{cart_lines}, после группировки: {len(grouped)}, '
+            f'после сложения единиц: {len(list(merge_units(grouped)))}'
+        )
+        variants = (
+            ('orm sum', lambda: list(self.orm_sum(user))),
+            ('orm sum + merge', lambda: list(merge_units(self.orm_sum(user)))),
+            ('list + merge', lambda: list(shopping_list_rows(user))),
+            ('merge only', lambda: list(merge_units(grouped))),
+        )
+        for name, run in variants:
+            self.stdout.write(f'{name:<16} {self.measure(run):>9.2f} мс')
+
+    def orm_sum(self, user):
+        '''Прежняя агрегация: Sum по (название, единица) в SQL.'''
+        return IngredientAmount.objects.filter(
+            recipe__carts__user=user
+        ).values(
+            name=F('ingredients__name'),
+            measurement_unit=F('ingredients__measurement_unit'),
+        ).annotate(amount=Sum('amount')).order_by('name', 'measurement_unit')
+
+    def measure(self, run):
+        '''Медиана времени repeat запусков, в мс.'''
+        timings = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
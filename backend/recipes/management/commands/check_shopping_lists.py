@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from recipes.models import ShoppingCart, ShoppingListItem
+from recipes.shopping_list import find_mismatches, rebuild
+
+
+class Command(BaseCommand):
+    '''
+    Сверяет списки покупок с Корзиной покупок
+    и, с флагом --fix, пересобирает расходящиеся.
+    '''
+
+    help = 'compare shopping list totals with the shopping cart join'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='rebuild shopping lists of users with mismatches',
+        )
+
+    def handle(self, *args, **options):
+        users = set()
+        mismatches = 0
+        for user, ingredient, expected, actual in find_mismatches():
+            mismatches += 1
+            users.add(user)
+            self.stdout.write(
+                f'пользователь {user}, ингредиент {ingredient}: '
+                f'ожидается {expected}, записано {actual}'
+            )
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+        self.stdout.write(
+            f'Расхождений: {mismatches}, пользователей: {len(users)}'
+        )
+        if options['fix']:
+            rebuild(ShoppingCart, ShoppingListItem, users)
+            self.stdout.write(self.style.SUCCESS('Списки покупок пересобраны'))
@@ -0,0 +1,51 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.transfer import EXPORT_CHUNK_SIZE, export_recipes
+
+
+class Command(BaseCommand):
+    '''
+    Выгружает рецепты с ингредиентами и тегами в JSONL:
+    по одному рецепту в строке. Рецепты читаются порциями,
+    поэтому выгрузка не загружает базу в память целиком.
+    '''
+
+    help = 'export recipes with ingredients and tags to jsonl'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'filename',
+            nargs='?',
+            default='-',
+            type=str,
+            help='output file, stdout by default',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            default=EXPORT_CHUNK_SIZE,
+            type=int,
+            help='rows fetched from the database at once',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        rows = 0
+        output = (
+            sys.stdout if options['filename'] == '-'
+            else open(options['filename'], 'w', encoding='utf-8')
+        )
+        try:
+            for recipe in export_recipes(options['chunk_size']):
+                output.write(json.dumps(recipe, ensure_ascii=False) + '\n')
+                rows += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.monotonic() - started
+        self.stderr.write(
+            f'Рецептов: {rows} за {elapsed:.2f} с '
+            f'({rows / max(elapsed, 1e-6):.0f} строк/с)'
+        )
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.images import IMAGES_DIR
+from recipes.media_gc import collect, image_references, upload_references
+from recipes.storage import image_storage, upload_storage
+
+
+class Command(BaseCommand):
+    '''
+    Удаляет фото, копии и исходные загрузки, на которые
+    не ссылается ни один рецепт. Ссылки и файлы читаются
+    упорядоченными потоками и сливаются, не загружаясь в память.
+    '''
+
+    help = 'delete recipe images and uploads that no recipe references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age',
+            default=3600,
+            type=int,
+            help='keep files modified less than this many seconds ago',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='only count unreferenced files',
+        )
+
+    def handle(self, *args, **options):
+        uploads = upload_storage()
+        targets = (
+            ('Фото', image_storage, IMAGES_DIR, image_references()),
+            ('Загрузки', uploads, 'recipes', upload_references()),
+        )
+        action = 'найдено' if options['dry_run'] else 'удалено'
+        for title, storage, path, references in targets:
+            started = time.monotonic()
+            stats = collect(
+                storage, path, references,
+                options['min_age'], options['dry_run'],
+            )
+            self.stdout.write(
+                f'{title}: файлов {stats["files"]}, '
+                f'{action} без ссылок {stats["deleted"]} '
+                f'за {time.monotonic() - started:.2f} с'
+            )
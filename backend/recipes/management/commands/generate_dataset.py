@@ -0,0 +1,74 @@
+import time
+
+from api.cache import bump_version
+from django.core.management.base import BaseCommand
+from recipes.dataset import generate_dataset
+
+
+class Command(BaseCommand):
+    '''
+    Заполняет базу синтетическими данными для нагрузочного
+    тестирования. Объём задаётся числом пользователей и рецептов
+    и средним числом связей на рецепт или пользователя.
+    '''
+
+    help = 'generate a reproducible synthetic dataset for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', default=10000, type=int)
+        parser.add_argument('--recipes', default=30000, type=int)
+        parser.add_argument(
+            '--ingredients', default=8, type=int,
+            help='average number of ingredients per recipe',
+        )
+        parser.add_argument(
+            '--favorites', default=20, type=int,
+            help='average number of favorite recipes per user',
+        )
+        parser.add_argument(
+            '--carts', default=3, type=int,
+            help='average number of recipes in a shopping cart',
+        )
+        parser.add_argument(
+            '--subscriptions', default=10, type=int,
+            help='average number of subscriptions per user',
+        )
+        parser.add_argument('--seed', default=0, type=int)
+        parser.add_argument(
+            '--exponent', default=1.1, type=float,
+            help='Zipf exponent of recipe, author and ingredient popularity',
+        )
+        parser.add_argument(
+            '--password', type=str,
+            help='password of generated users, unusable by default',
+        )
+
+    def handle(self, *args, **options):
+        started = last = time.monotonic()
+
+        def report(name, rows):
+            nonlocal last
+            now = time.monotonic()
+            self.stdout.write(
+                f'{name}: {rows} строк за {now - last:.2f} с '
+                f'({rows / max(now - last, 1e-6):.0f} строк/с)'
+            )
+            last = now
+
+        stats = generate_dataset(
+            users=options['users'],
+            recipes=options['recipes'],
+            ingredients=options['ingredients'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            subscriptions=options['subscriptions'],
+            seed=options['seed'],
+            exponent=options['exponent'],
+            password=options['password'],
+            report=report,
+        )
+        bump_version('recipes', 'catalog', 'ingredients', 'tags')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Сгенерировано строк: {sum(stats.values())} за {elapsed:.2f} с'
+        ))
@@ -0,0 +1,78 @@
+import sys
+import time
+
+from api.cache import bump_version
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from recipes.transfer import IMPORT_BATCH_SIZE, import_recipes
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    '''
+    Загружает рецепты из JSONL, созданного командой export_recipes.
+    Рецепты записываются пачками, уже существующие пропускаются,
+    строки с ошибками пропускаются с сообщением в stderr.
+    '''
+
+    help = 'import recipes with ingredients and tags from jsonl'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'filename',
+            nargs='?',
+            default='-',
+            type=str,
+            help='input file, stdin by default',
+        )
+        parser.add_argument(
+            '--batch-size',
+            default=IMPORT_BATCH_SIZE,
+            type=int,
+            help='recipes written to the database at once',
+        )
+        parser.add_argument(
+            '--default-author',
+            type=str,
+            help='username for recipes whose author does not exist',
+        )
+
+    def handle(self, *args, **options):
+        author = None
+        if options['default_author']:
+            author = User.objects.filter(
+                username=options['default_author']
+            ).first()
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["default_author"]} не найден'
+                )
+        started = time.monotonic()
+        try:
+            lines = (
+                sys.stdin if options['filename'] == '-'
+                else open(options['filename'], encoding='utf-8')
+            )
+        except FileNotFoundError:
+            raise CommandError(
+                f'Не удается найти файл {options["filename"]}'
+            )
+        try:
+            stats = import_recipes(
+                lines, options['batch_size'], author, self.stderr.write
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            if lines is not sys.stdin:
+                lines.close()
+            bump_version('recipes', 'catalog', 'ingredients')
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Строк: {stats["rows"]} за {elapsed:.2f} с '
+            f'({stats["rows"] / max(elapsed, 1e-6):.0f} строк/с), '
+            f'добавлено рецептов: {stats["created"]}, '
+            f'пропущено: {stats["rows"] - stats["created"]}, '
+            f'из них с ошибками: {stats["invalid"]}'
+        )
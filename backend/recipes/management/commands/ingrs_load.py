@@ -1,15 +1,20 @@
-import csv
 import os
+import time
 
+from api.cache import bump_version
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from recipes.models import Ingredient
+from django.db import DatabaseError, connection
+from recipes.loaders import copy_ingredients, load_ingredients
 
 CSV_DATA = os.path.join(settings.BASE_DIR, 'data')
 
 
 class Command(BaseCommand):
-    '''Добавляет ингредиенты из CSV файла  в Postqresql.'''
+    '''
+    Добавляет ингредиенты из CSV файла в Postqresql.
+    Файл читается порциями, на PostgreSQL загружается через COPY.
+    '''
 
     help = 'uploading ingredients from csv in db'
 
@@ -20,26 +25,40 @@ class Command(BaseCommand):
             nargs='?',
             type=str
         )
+        parser.add_argument(
+            '--replace-units',
+            action='store_true',
+            help='update the unit of ingredients whose unit has changed',
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='use bulk_create even on PostgreSQL instead of COPY',
+        )
 
     def handle(self, *args, **options):
+        path = os.path.join(CSV_DATA, options['filename'])
+        use_copy = connection.vendor == 'postgresql' and not options['bulk']
+        load = copy_ingredients if use_copy else load_ingredients
+        started = time.monotonic()
         try:
-            with open(
-                os.path.join(CSV_DATA, options['filename']), 'r',
-                encoding='utf-8'
-            ) as data:
-
-                ingredients = csv.reader(data)
-                for ingredient in ingredients:
-                    name, measurement_unit = ingredient
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
-                    )
-
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        'The database was successfully filled with ingredients'
-                    )
-                )
+            stats = load(path, replace_units=options['replace_units'])
         except FileNotFoundError:
-            raise CommandError('Не удается найти файл ingredients.csv')
+            raise CommandError(
+                f'Не удается найти файл {options["filename"]}'
+            )
+        except (ValueError, DatabaseError) as error:
+            raise CommandError(error)
+        elapsed = time.monotonic() - started
+        bump_version('catalog', 'ingredients')
+        self.stdout.write(
+            f'Строк: {stats["rows"]} за {elapsed:.2f} с '
+            f'({stats["rows"] / max(elapsed, 1e-6):.0f} строк/с), '
+            f'добавлено: {stats["created"]}, '
+            f'изменено единиц: {stats["updated"]}'
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                'The database was successfully filled with ingredients'
+            )
+        )
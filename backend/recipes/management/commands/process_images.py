@@ -0,0 +1,57 @@
+import time
+
+from api.cache import bump_version
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from recipes.image_jobs import claim_job, enqueue_missing, process_job
+
+
+class Command(BaseCommand):
+    '''
+    Воркер очереди фото: проверяет и перекодирует загруженные
+    фото рецептов и готовит их копии. Очередь хранится в БД
+    (Recipe.image_status), воркеров можно запускать несколько.
+    '''
+
+    help = 'process uploaded recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='exit when the queue is empty',
+        )
+        parser.add_argument(
+            '--sleep',
+            default=2.0,
+            type=float,
+            help='seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--enqueue-missing',
+            action='store_true',
+            help='queue recipes that have an image but no variants',
+        )
+
+    def handle(self, *args, **options):
+        if options['enqueue_missing']:
+            self.stdout.write(f'В очереди: {enqueue_missing()}')
+        processed = 0
+        while True:
+            job = claim_job(settings.IMAGE_JOB_TIMEOUT)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            started = time.monotonic()
+            status = process_job(*job)
+            if status is None:
+                continue
+            processed += 1
+            bump_version('recipes', f'recipe:{job[0]}')
+            self.stdout.write(
+                f'Рецепт {job[0]}: {status} '
+                f'за {time.monotonic() - started:.2f} с'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Обработано фото: {processed}'))
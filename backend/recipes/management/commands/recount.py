@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from recipes.counters import get_counters, repair_counters
+from recipes.models import Favorite, Recipe, ShoppingCart, Subscribe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    '''Пересчитывает денормализованные счётчики рецептов и пользователей.'''
+
+    help = 'recompute and repair favorites/carts/recipes/followers counters'
+
+    def handle(self, *args, **options):
+        repaired = repair_counters(
+            get_counters(Recipe, User, Favorite, ShoppingCart, Subscribe)
+        )
+        for counter, count in repaired.items():
+            self.stdout.write(f'{counter}: исправлено записей - {count}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
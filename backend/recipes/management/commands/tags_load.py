@@ -1,15 +1,19 @@
-import csv
 import os
+import time
 
+from api.cache import bump_version
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
-from recipes.models import Tag
+from recipes.loaders import load_tags
 
 CSV_DATA = os.path.join(settings.BASE_DIR, 'data')
 
 
 class Command(BaseCommand):
-    '''Добавляет теги из CSV файла  в Postqresql.'''
+    '''
+    Добавляет теги из CSV файла в Postqresql.
+    Существующие теги (по slug) получают название и цвет из файла.
+    '''
 
     help = 'uploading tags from csv in db'
 
@@ -22,22 +26,23 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
+        started = time.monotonic()
         try:
-            with open(
-                os.path.join(CSV_DATA, options['filename']), 'r',
-                encoding='utf-8'
-            ) as data:
-                tags = csv.reader(data)
-                for tag in tags:
-                    Tag.objects.get_or_create(
-                        name=tag[0],
-                        color=tag[1],
-                        slug=tag[2]
-                    )
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        'The database was successfully filled with tags'
-                    )
-                )
+            stats = load_tags(os.path.join(CSV_DATA, options['filename']))
         except FileNotFoundError:
-            raise CommandError('Не удается найти файл tags.csv')
+            raise CommandError(
+                f'Не удается найти файл {options["filename"]}'
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        elapsed = time.monotonic() - started
+        bump_version('catalog', 'tags')
+        self.stdout.write(
+            f'Строк: {stats["rows"]} за {elapsed:.2f} с, '
+            f'добавлено: {stats["created"]}, изменено: {stats["updated"]}'
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                'The database was successfully filled with tags'
+            )
+        )
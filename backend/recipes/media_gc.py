@@ -0,0 +1,124 @@
+import datetime
+import heapq
+import posixpath
+
+from django.db import connection
+from django.db.models import F
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Collate
+from django.utils import timezone
+
+from .config import IMAGE_FORMATS, IMAGE_VARIANTS
+from .models import Recipe
+
+# Сколько строк читается из серверного курсора за раз.
+CHUNK_SIZE = 2000
+# Сколько файлов удаляется за один шаг.
+DELETE_BATCH_SIZE = 500
+# Побайтовое сравнение строк: порядок совпадает с сортировкой в Python.
+BINARY_COLLATIONS = {
+    'postgresql': 'C',
+    'sqlite': 'BINARY',
+    'mysql': 'utf8mb4_bin',
+}
+
+
+def sorted_references(expression):
+    '''Непустые значения выражения по всем рецептам в порядке Python.'''
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    ordering = Collate(F('ref'), collation) if collation else F('ref')
+    return Recipe.objects.annotate(ref=expression).exclude(
+        ref__isnull=True
+    ).exclude(ref='').order_by(ordering).values_list(
+        'ref', flat=True
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def image_references():
+    '''
+    Имена файлов хранилища фото, на которые ссылаются рецепты:
+    фото и все копии из IMAGE_VARIANTS и IMAGE_FORMATS.
+    Потоки упорядочены в БД и сливаются без загрузки в память.
+    '''
+    streams = [sorted_references(F('image'))]
+    for variant in IMAGE_VARIANTS:
+        for key in IMAGE_FORMATS:
+            streams.append(sorted_references(
+                KeyTextTransform(key, KeyTransform(variant, 'image_variants'))
+            ))
+    return heapq.merge(*streams)
+
+
+def upload_references():
+    '''Имена исходных загрузок, которые ещё ждут обработки.'''
+    return sorted_references(F('image_upload'))
+
+
+def walk(storage, path):
+    '''
+    Имена всех файлов каталога хранилища в порядке сортировки строк.
+    Каталоги обходятся как имена с '/' на конце, поэтому порядок
+    совпадает с сортировкой полных путей.
+    '''
+    directories, files = storage.listdir(path)
+    entries = [(name + '/', True) for name in directories]
+    entries += [(name, False) for name in files]
+    for name, is_directory in sorted(entries):
+        full_name = posixpath.join(path, name.rstrip('/'))
+        if is_directory:
+            yield from walk(storage, full_name)
+        else:
+            yield full_name
+
+
+def unreferenced(files, references):
+    '''Слияние двух упорядоченных потоков: файлы без ссылок.'''
+    reference = next(references, None)
+    for name in files:
+        while reference is not None and reference < name:
+            reference = next(references, None)
+        if reference != name:
+            yield name
+
+
+def collect(storage, path, references, min_age, dry_run=False):
+    '''
+    Удаляет пачками файлы каталога path, на которые нет ссылок
+    и которые старше min_age секунд: более новые файлы могут
+    принадлежать ещё не завершённой транзакции.
+    Возвращает число файлов и число удалённых (или найденных) файлов.
+    '''
+    stats = {'files': 0, 'deleted': 0}
+    if not storage.exists(path):
+        return stats
+    threshold = timezone.now() - datetime.timedelta(seconds=min_age)
+
+    def counted(files):
+        for name in files:
+            stats['files'] += 1
+            yield name
+
+    batch = []
+    for name in unreferenced(counted(walk(storage, path)), references):
+        batch.append(name)
+        if len(batch) == DELETE_BATCH_SIZE:
+            stats['deleted'] += delete(storage, batch, threshold, dry_run)
+            batch = []
+    stats['deleted'] += delete(storage, batch, threshold, dry_run)
+    return stats
+
+
+def delete(storage, names, threshold, dry_run):
+    '''
+    Удаляет файлы, изменённые раньше threshold. Время проверяется
+    непосредственно перед удалением: ContentHashStorage обновляет его,
+    когда повторно сохраняет уже существующий файл.
+    '''
+    deleted = 0
+    for name in names:
+        if storage.get_modified_time(name) >= threshold:
+            continue
+        if not dry_run:
+            storage.delete(name)
+        deleted += 1
+    return deleted
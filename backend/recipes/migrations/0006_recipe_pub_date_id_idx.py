@@ -0,0 +1,22 @@
+# Generated by Django 3.2.17 on 2026-10-18 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_alter_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tag',
+            name='color',
+            field=models.CharField(choices=[('#E26C2D', '#E26C2D'), ('#c4a623', '#c4a623'), ('#59390c', '#59390c'), ('#ca335c', '#ca335c'), ('#5a918a', '#5a918a'), ('#05f0c1', '#05f0c1'), ('#ffd966', '#ffd966'), ('#26ff7b', '#26ff7b'), ('#cd0800', '#cd0800'), ('#ba4848', '#ba4848'), ('#8e8e8e', '#8e8e8e'), ('#098765', '#098765'), ('#ff4f1e', '#ff4f1e')], default='#ffffff', help_text='Выберите цвет', max_length=7, unique=True, verbose_name='Цветовой HEX-код'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['pub_date', 'id'], name='recipe_pub_date_id_idx'),
+        ),
+    ]
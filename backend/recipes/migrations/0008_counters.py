@@ -0,0 +1,38 @@
+# Generated by Django 3.2.17 on 2026-10-18 05:28
+
+from django.conf import settings
+from django.db import migrations, models
+from recipes.counters import get_counters, repair_counters
+
+
+def fill_counters(apps, schema_editor):
+    user_model = settings.AUTH_USER_MODEL.split('.')
+    repair_counters(get_counters(
+        apps.get_model('recipes', 'Recipe'),
+        apps.get_model(*user_model),
+        apps.get_model('recipes', 'Favorite'),
+        apps.get_model('recipes', 'ShoppingCart'),
+        apps.get_model('recipes', 'Subscribe'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_modified_timestamps'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
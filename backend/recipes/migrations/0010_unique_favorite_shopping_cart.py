@@ -0,0 +1,48 @@
+# Generated by Django 3.2.17 on 2026-10-18 05:39
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Min
+from recipes.counters import get_counters, repair_counters
+from recipes.shopping_list import rebuild
+
+
+def remove_duplicates(apps, schema_editor):
+    '''
+    Оставляет по одной записи на пару (пользователь, рецепт)
+    и пересчитывает зависящие от них счётчики и списки покупок.
+    '''
+    favorite = apps.get_model('recipes', 'Favorite')
+    shopping_cart = apps.get_model('recipes', 'ShoppingCart')
+    for model in (favorite, shopping_cart):
+        first = model.objects.values('user', 'recipe').annotate(
+            first=Min('id')
+        ).values('first')
+        model.objects.exclude(id__in=first).delete()
+    repair_counters(get_counters(
+        apps.get_model('recipes', 'Recipe'),
+        apps.get_model(*settings.AUTH_USER_MODEL.split('.')),
+        favorite,
+        shopping_cart,
+        apps.get_model('recipes', 'Subscribe'),
+    ))
+    rebuild(shopping_cart, apps.get_model('recipes', 'ShoppingListItem'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_shopping_list'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart_user_recipe'),
+        ),
+    ]
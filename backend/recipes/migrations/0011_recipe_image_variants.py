@@ -0,0 +1,18 @@
+# Generated by Django 3.2.17 on 2026-10-18 06:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_unique_favorite_shopping_cart'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Уменьшенные копии фото в форматах WebP и JPEG', verbose_name='Копии фото'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.17 on 2026-10-18 06:03
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_claimed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Фото взято в обработку'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('pending', 'Ожидает обработки'), ('processing', 'Обрабатывается'), ('ready', 'Готово'), ('failed', 'Ошибка обработки')], db_index=True, default='ready', editable=False, max_length=10, verbose_name='Обработка фото'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_upload',
+            field=models.FileField(blank=True, editable=False, help_text='Исходная загрузка до проверки и перекодирования', storage=recipes.storage.upload_storage, upload_to='recipes/', verbose_name='Загруженное фото'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.2.17 on 2026-10-18 06:06
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipe_image_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(help_text='Загрузите фотографию блюда', storage=recipes.storage.ContentHashStorage(), upload_to='recipes_images/', verbose_name='Фото блюда'),
+        ),
+    ]
@@ -1,7 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
-from .config import HEX_COLORS, MEASURMENTS_UNITS
+from .config import HEX_COLORS, IMAGE_READY, IMAGE_STATUSES, MEASURMENTS_UNITS
+from .storage import image_storage, upload_storage
 
 User = get_user_model()
 
@@ -30,6 +33,10 @@ class Tag(models.Model):
         blank=False,
         help_text='Придумайте slug для тега',
     )
+    modified = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -55,6 +62,10 @@ class Ingredient(models.Model):
         choices=MEASURMENTS_UNITS,
         help_text='Выберите единицу измерения',
     )
+    modified = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+    )
 
     class Meta:
         ordering = ('-id',)
@@ -71,6 +82,40 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    '''Набор запросов для рецептов.'''
+
+    def with_ingredient_amounts(self):
+        '''Подгружает количество ингредиентов всех рецептов одним запросом.'''
+        return self.prefetch_related(ingredient_amounts_prefetch())
+
+    def latest_per_author(self, authors, limit):
+        '''
+        Не больше limit последних рецептов каждого из authors одним
+        запросом: рецепты нумеруются ROW_NUMBER() OVER (PARTITION BY
+        author_id), подзапрос оставляет первые limit номеров.
+        authors - список: для пустого запрос не выполняется.
+        '''
+        if limit <= 0 or not authors:
+            return self.none()
+        ranked = self.filter(author__in=authors).annotate(
+            row_number=models.Window(
+                RowNumber(),
+                partition_by=models.F('author_id'),
+                order_by=(
+                    models.F('pub_date').desc(), models.F('id').desc()
+                ),
+            )
+        ).order_by().values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        quote = connections[self.db].ops.quote_name
+        return self.filter(pk__in=RawSQL(
+            f'SELECT {quote("id")} FROM ({sql}) AS ranked '
+            f'WHERE {quote("row_number")} <= %s',
+            (*params, limit),
+        )).order_by('author_id', '-pub_date', '-id')
+
+
 class Recipe(models.Model):
     '''Модель для рецептов.'''
     author = models.ForeignKey(
@@ -93,8 +138,38 @@ class Recipe(models.Model):
     image = models.ImageField(
         'Фото блюда',
         upload_to='recipes_images/',
+        storage=image_storage,
         help_text='Загрузите фотографию блюда',
     )
+    image_variants = models.JSONField(
+        'Копии фото',
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Уменьшенные копии фото в форматах WebP и JPEG',
+    )
+    image_upload = models.FileField(
+        'Загруженное фото',
+        storage=upload_storage,
+        upload_to='recipes/',
+        blank=True,
+        editable=False,
+        help_text='Исходная загрузка до проверки и перекодирования',
+    )
+    image_status = models.CharField(
+        'Обработка фото',
+        max_length=10,
+        choices=IMAGE_STATUSES,
+        default=IMAGE_READY,
+        db_index=True,
+        editable=False,
+    )
+    image_claimed_at = models.DateTimeField(
+        'Фото взято в обработку',
+        null=True,
+        blank=True,
+        editable=False,
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         verbose_name='Ингредиенты рецепта',
@@ -118,11 +193,35 @@ class Recipe(models.Model):
         'Дата публикации рецепта',
         auto_now_add=True,
     )
+    modified = models.DateTimeField(
+        'Дата изменения рецепта',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        db_index=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('id',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = (
+            models.Index(
+                fields=('pub_date', 'id'),
+                name='recipe_pub_date_id_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -192,6 +291,17 @@ class IngredientAmount(models.Model):
         return f'{self.ingredients} {self.amount}'
 
 
+def ingredient_amounts_prefetch():
+    '''
+    Prefetch для количества ингредиентов рецепта
+    вместе с самими ингредиентами.
+    '''
+    return models.Prefetch(
+        'ingredient',
+        queryset=IngredientAmount.objects.select_related('ingredients'),
+    )
+
+
 class Subscribe(models.Model):
     '''Модель связи автор рецепта и пользователя.'''
 
@@ -241,6 +351,12 @@ class ShoppingCart(models.Model):
     class Meta:
         verbose_name = 'Корзина покупок'
         verbose_name_plural = 'Корзины покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_shopping_cart_user_recipe',
+            ),
+        )
 
     def __str__(self) -> str:
         return f'{self.recipe} в корзине у {self.user}'
@@ -265,6 +381,49 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_favorite_user_recipe',
+            ),
+        )
 
     def __str__(self) -> str:
         return f'{self.recipe} в Избранном у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    '''
+    Суммарное количество ингредиента в Корзине покупок пользователя.
+    Поддерживается инкрементально (см. recipes.shopping_list),
+    сверяется с Корзиной командой check_shopping_lists.
+    '''
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    # Не Positive: при вычитании значение может кратковременно
+    # стать отрицательным до удаления строки.
+    amount = models.IntegerField('Количество', default=0)
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item',
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.ingredient} {self.amount} у {self.user}'
@@ -0,0 +1,159 @@
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Sum
+
+from .models import IngredientAmount, ShoppingCart, ShoppingListItem
+
+# Сколько строк списка покупок читается или создаётся за один запрос.
+BATCH_SIZE = 500
+# Сколько изменений записывается одним INSERT ... ON CONFLICT: по три
+# параметра на строку, с запасом до лимита параметров SQLite (32766).
+UPSERT_BATCH_SIZE = 10000
+
+
+def apply_deltas(deltas):
+    '''
+    Прибавляет к спискам покупок изменения
+    {(id пользователя, id ингредиента): изменение количества}
+    одним INSERT ... ON CONFLICT DO UPDATE на UPSERT_BATCH_SIZE
+    изменений, поэтому число запросов почти не зависит от их числа.
+    Недостающие строки создаются, строки с нулевым
+    или отрицательным количеством удаляются вторым запросом.
+    '''
+    deltas = [
+        (user, ingredient, delta)
+        for (user, ingredient), delta in deltas.items() if delta
+    ]
+    quote = connection.ops.quote_name
+    meta = ShoppingListItem._meta
+    table = quote(meta.db_table)
+    user, ingredient, amount, pk = (
+        quote(meta.get_field(name).column)
+        for name in ('user', 'ingredient', 'amount', 'id')
+    )
+    for start in range(0, len(deltas), UPSERT_BATCH_SIZE):
+        batch = deltas[start:start + UPSERT_BATCH_SIZE]
+        values = ', '.join(['(%s, %s, %s)'] * len(batch))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+                f'VALUES {values} ON CONFLICT ({user}, {ingredient}) '
+                f'DO UPDATE SET {amount} = {table}.{amount} + '
+                f'EXCLUDED.{amount} RETURNING {pk}, {amount}',
+                [value for row in batch for value in row],
+            )
+            empty = [
+                row_pk for row_pk, total in cursor.fetchall() if total <= 0
+            ]
+        if empty:
+            ShoppingListItem.objects.filter(pk__in=empty).delete()
+
+
+def cart_deltas(carts, sign=1):
+    '''
+    Изменения списков покупок при добавлении (sign=1) или удалении
+    (sign=-1) рецептов из Корзины. carts - пары (пользователь, рецепт).
+    '''
+    users_by_recipe = defaultdict(list)
+    for user, recipe in carts:
+        users_by_recipe[recipe].append(user)
+    deltas = defaultdict(int)
+    amounts = IngredientAmount.objects.filter(
+        recipe__in=users_by_recipe
+    ).values_list('recipe', 'ingredients', 'amount')
+    for recipe, ingredient, amount in amounts:
+        for user in users_by_recipe[recipe]:
+            deltas[user, ingredient] += sign * amount
+    return deltas
+
+
+def recipe_deltas(recipe, changes):
+    '''
+    Изменения списков покупок у всех, кто положил рецепт в Корзину,
+    при изменении его ингредиентов: changes - {id ингредиента: изменение}.
+    '''
+    deltas = {}
+    users = ShoppingCart.objects.filter(
+        recipe=recipe
+    ).values_list('user', flat=True)
+    for user in users:
+        for ingredient, delta in changes.items():
+            deltas[user, ingredient] = delta
+    return deltas
+
+
+def live_totals(shopping_cart, users=None):
+    '''
+    Списки покупок, посчитанные по Корзине: строки
+    (пользователь, ингредиент, количество), упорядоченные
+    по пользователю и ингредиенту.
+    Модель передаётся явно, чтобы функцию можно было
+    использовать и в миграциях.
+    '''
+    carts = shopping_cart.objects.all()
+    if users is not None:
+        carts = carts.filter(user__in=users)
+    return carts.filter(
+        recipe__ingredient__isnull=False
+    ).values_list(
+        'user', 'recipe__ingredient__ingredients'
+    ).annotate(
+        amount=Sum('recipe__ingredient__amount')
+    ).order_by('user_id', 'recipe__ingredient__ingredients_id')
+
+
+def rebuild(shopping_cart, shopping_list_item, users=None):
+    '''
+    Пересобирает списки покупок указанных (по умолчанию всех)
+    пользователей по Корзине. Возвращает число записанных строк.
+    '''
+    items = shopping_list_item.objects.all()
+    if users is not None:
+        items = items.filter(user__in=users)
+    items.delete()
+    batch = []
+    created = 0
+    totals = live_totals(shopping_cart, users).iterator(chunk_size=BATCH_SIZE)
+    for user, ingredient, amount in totals:
+        batch.append(shopping_list_item(
+            user_id=user, ingredient_id=ingredient, amount=amount
+        ))
+        if len(batch) == BATCH_SIZE:
+            shopping_list_item.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    shopping_list_item.objects.bulk_create(batch)
+    return created + len(batch)
+
+
+def find_mismatches():
+    '''
+    Сверяет списки покупок с Корзиной слиянием двух
+    упорядоченных по id потоков строк, не загружая их целиком в память.
+    Отдаёт (пользователь, ингредиент, ожидаемое, записанное количество).
+    '''
+    expected = live_totals(ShoppingCart).iterator(chunk_size=BATCH_SIZE)
+    actual = ShoppingListItem.objects.order_by(
+        'user_id', 'ingredient_id'
+    ).values_list(
+        'user', 'ingredient', 'amount'
+    ).iterator(chunk_size=BATCH_SIZE)
+    expected_row = next(expected, None)
+    actual_row = next(actual, None)
+    while expected_row is not None or actual_row is not None:
+        expected_key = expected_row and expected_row[:2]
+        actual_key = actual_row and actual_row[:2]
+        if actual_row is None or (
+            expected_row is not None and expected_key < actual_key
+        ):
+            yield (*expected_key, expected_row[2], 0)
+            expected_row = next(expected, None)
+        elif expected_row is None or actual_key < expected_key:
+            yield (*actual_key, 0, actual_row[2])
+            actual_row = next(actual, None)
+        else:
+            if expected_row[2] != actual_row[2]:
+                yield (*expected_key, expected_row[2], actual_row[2])
+            expected_row = next(expected, None)
+            actual_row = next(actual, None)
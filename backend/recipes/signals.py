@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .config import IMAGE_PENDING
+from .models import (Favorite, IngredientAmount, Recipe, ShoppingCart,
+                     Subscribe, TagRecipe)
+from .shopping_list import apply_deltas, cart_deltas, recipe_deltas
+
+User = get_user_model()
+
+# Счётчики записей pks модели sender изменены в обход save(),
+# аргументы: pks, field.
+counters_changed = Signal()
+
+# Модель-источник: (поле внешнего ключа, модель со счётчиком, счётчик).
+COUNTERS = {
+    Favorite: ('recipe_id', Recipe, 'favorites_count'),
+    ShoppingCart: ('recipe_id', Recipe, 'carts_count'),
+    Subscribe: ('author_id', User, 'followers_count'),
+    Recipe: ('author_id', User, 'recipes_count'),
+}
+
+
+def change_counter(instance, delta):
+    '''Атомарно изменяет счётчик, связанный с instance, на delta.'''
+    fk_field = COUNTERS[type(instance)][0]
+    change_counters(type(instance), [getattr(instance, fk_field)], delta)
+
+
+def change_counters(sender, pks, delta):
+    '''
+    Одним UPDATE изменяет на delta счётчики записей pks,
+    связанных с моделью sender. Для массовых операций,
+    при которых сигналы не отправляются.
+    Отправляет counters_changed: UPDATE не вызывает post_save.
+    '''
+    fk_field, model, field = COUNTERS[sender]
+    model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+    counters_changed.send(sender=model, pks=pks, field=field)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscribe)
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, created, **kwargs):
+    '''Увеличивает счётчик при создании записи.'''
+    if created:
+        change_counter(instance, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscribe)
+@receiver(post_delete, sender=Recipe)
+def decrement_counter(sender, instance, **kwargs):
+    '''Уменьшает счётчик при удалении записи.'''
+    change_counter(instance, -1)
+
+
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+@receiver(post_save, sender=IngredientAmount)
+@receiver(post_delete, sender=IngredientAmount)
+def touch_recipe(sender, instance, **kwargs):
+    '''
+    Обновляет дату изменения рецепта при изменении его тегов
+    или ингредиентов, например, через админку.
+    '''
+    Recipe.objects.filter(pk=instance.recipe_id).update(
+        modified=timezone.now()
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    '''Добавляет ингредиенты рецепта в список покупок.'''
+    if created:
+        apply_deltas(cart_deltas([(instance.user_id, instance.recipe_id)]))
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    '''Вычитает ингредиенты рецепта из списка покупок.'''
+    apply_deltas(
+        cart_deltas([(instance.user_id, instance.recipe_id)], sign=-1)
+    )
+
+
+@receiver(pre_save, sender=IngredientAmount)
+def remember_ingredient_amount(sender, instance, **kwargs):
+    '''Запоминает прежние рецепт, ингредиент и количество.'''
+    instance._previous = None
+    if not instance._state.adding:
+        instance._previous = IngredientAmount.objects.filter(
+            pk=instance.pk
+        ).values_list('recipe', 'ingredients', 'amount').first()
+
+
+@receiver(post_save, sender=IngredientAmount)
+def update_shopping_lists(sender, instance, **kwargs):
+    '''
+    Обновляет списки покупок у всех, у кого рецепт в Корзине,
+    при добавлении или изменении ингредиента рецепта.
+    '''
+    deltas = recipe_deltas(
+        instance.recipe_id, {instance.ingredients_id: instance.amount}
+    )
+    previous = getattr(instance, '_previous', None)
+    if previous is not None:
+        recipe, ingredient, amount = previous
+        for key, delta in recipe_deltas(recipe, {ingredient: -amount}).items():
+            deltas[key] = deltas.get(key, 0) + delta
+    apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=IngredientAmount)
+def subtract_from_shopping_lists(sender, instance, **kwargs):
+    '''Вычитает удалённый ингредиент рецепта из списков покупок.'''
+    apply_deltas(recipe_deltas(
+        instance.recipe_id, {instance.ingredients_id: -instance.amount}
+    ))
+
+
+@receiver(pre_save, sender=Recipe)
+def queue_image(sender, instance, **kwargs):
+    '''
+    Новое фото (загрузка через API или замена в админке) ставится
+    в очередь process_images; в запросе фото не декодируется.
+    '''
+    if any(
+        file and not file._committed
+        for file in (instance.image, instance.image_upload)
+    ):
+        instance.image_status = IMAGE_PENDING
+        instance.image_claimed_at = None
@@ -0,0 +1,52 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    '''
+    Хранилище, в котором имя файла - хэш его содержимого:
+    каталог/ab/abcdef....jpg. Одинаковые файлы хранятся один раз,
+    повторная запись возвращает имя уже сохранённого файла.
+    Файл может использоваться несколькими записями, поэтому
+    удаляются файлы только командой gc_media.
+    '''
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            # Свежее время изменения защищает файл от gc_media,
+            # пока новая ссылка на него не записана в БД.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def get_hashed_name(self, name, content):
+        '''Имя из каталога и расширения name и хэша содержимого.'''
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()[:32]
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+
+image_storage = ContentHashStorage()
+
+
+def upload_storage():
+    '''
+    Хранилище исходных загрузок фото. Передаётся в поле функцией,
+    чтобы путь из настроек не попал в миграции.
+    '''
+    return FileSystemStorage(location=settings.IMAGE_UPLOADS_ROOT)
@@ -0,0 +1,82 @@
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from recipes.config import IMAGE_PENDING, IMAGE_READY
+from recipes.image_jobs import claim_job, process_job
+
+
+def image_data(size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 100, 50)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@pytest.fixture
+def recipe_url(user_client, tags, ingredients,
+               django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post('/api/recipes/', {
+            'name': 'Блины',
+            'text': 'Описание',
+            'cooking_time': 20,
+            'tags': [tag.pk for tag in tags],
+            'ingredients': [
+                {'id': ingredient.pk, 'amount': 10}
+                for ingredient in ingredients
+            ],
+            'image': image_data(),
+        }, format='json')
+    assert response.status_code == 201
+    return f'/api/recipes/{response.data["id"]}/'
+
+
+def process_all():
+    '''Обрабатывает очередь фото, как process_images --once.'''
+    statuses = []
+    while True:
+        job = claim_job(timeout=300)
+        if job is None:
+            return statuses
+        statuses.append(process_job(*job))
+
+
+def test_etag_changes_after_processing(user_client, recipe_url):
+    response = user_client.get(recipe_url)
+    assert response.data['image_status'] == IMAGE_PENDING
+    etag = response['ETag']
+    assert user_client.get(
+        recipe_url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+
+    assert process_all() == [IMAGE_READY]
+    response = user_client.get(recipe_url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert response.data['image_status'] == IMAGE_READY
+    assert response.data['image_variants']
+
+
+def test_etag_changes_when_job_is_claimed(user_client, recipe_url):
+    etag = user_client.get(recipe_url)['ETag']
+    assert claim_job(timeout=300) is not None
+    assert user_client.get(
+        recipe_url, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+
+def test_unfinished_images_are_not_cached(anonymous_client, recipe_url):
+    for url in (recipe_url, '/api/recipes/'):
+        assert anonymous_client.get(url)['X-Cache'] == 'MISS'
+        assert anonymous_client.get(url)['X-Cache'] == 'MISS'
+
+    # Версии повышает воркер; с кэшем в памяти другого процесса
+    # веб-процесс их не увидит.
+    process_all()
+    for url in (recipe_url, '/api/recipes/'):
+        response = anonymous_client.get(url)
+        assert response['X-Cache'] == 'MISS'
+        assert anonymous_client.get(url)['X-Cache'] == 'HIT'
@@ -0,0 +1,56 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from recipes.config import IMAGE_FORMATS, IMAGE_VARIANTS
+from recipes.images import make_variants, open_image, process_image
+from recipes.storage import image_storage
+
+
+def image_file(mode='RGB', size=(1600, 1200), image_format='PNG', color=None,
+               **params):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, image_format, **params)
+    buffer.seek(0)
+    return buffer
+
+
+def test_transparent_image_gets_white_background():
+    image = open_image(image_file('RGBA', (4, 4), color=(255, 0, 0, 0)))
+    assert image.mode == 'RGB'
+    assert image.getpixel((0, 0)) == (255, 255, 255)
+
+
+def test_image_is_rotated_by_exif():
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    image = open_image(image_file(
+        size=(40, 20), image_format='JPEG', exif=exif.tobytes()
+    ))
+    assert image.size == (20, 40)
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError):
+        open_image(image_file(image_format='BMP'))
+
+
+def test_variants_are_not_upscaled():
+    variants = make_variants(open_image(image_file(size=(800, 600))))
+    assert variants.keys() == IMAGE_VARIANTS.keys()
+    for name, (width, height) in IMAGE_VARIANTS.items():
+        variant = variants[name]
+        assert variant['width'] <= min(width, 800)
+        assert variant['height'] <= min(height, 600)
+        for key in IMAGE_FORMATS:
+            assert image_storage.exists(variant[key])
+    assert variants['full']['width'] == 800
+
+
+def test_process_image_is_stored_by_content():
+    name, variants = process_image(image_file())
+    again, variants_again = process_image(image_file())
+    assert name == again
+    assert variants == variants_again
+    with image_storage.open(name) as stored:
+        assert Image.open(stored).format == 'JPEG'
@@ -0,0 +1,61 @@
+import io
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from recipes.models import Ingredient
+
+# Загрузка через COPY (только PostgreSQL) и через INSERT.
+LOADERS = (
+    pytest.param({}, marks=pytest.mark.postgresql, id='copy'),
+    pytest.param({'bulk': True}, id='insert'),
+)
+
+
+@pytest.fixture
+def load(db, tmp_path):
+    '''Загружает ингредиенты из CSV с переданными строками.'''
+
+    def load(lines, **options):
+        path = tmp_path / 'ingredients.csv'
+        path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        stdout = io.StringIO()
+        call_command('ingrs_load', str(path), stdout=stdout, **options)
+        return stdout.getvalue()
+
+    return load
+
+
+@pytest.mark.parametrize('options', LOADERS)
+def test_load_ingredients(load, options):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    output = load([
+        'мука,г', ' мука , г ', '', 'молоко,мл', 'соль,г',
+    ], **options)
+    assert output.startswith('Строк: 4 за ')
+    assert 'добавлено: 2,' in output
+    assert set(Ingredient.objects.values_list(
+        'name', 'measurement_unit'
+    )) == {('мука', 'г'), ('молоко', 'мл'), ('соль', 'г')}
+
+
+@pytest.mark.parametrize('options', LOADERS)
+@pytest.mark.parametrize('line, error', (
+    (' ,г', 'Строка 2: name: пустое значение'),
+    ('молоко,', 'Строка 2: measurement_unit: пустое значение'),
+    ('молоко,' + 'г' * 51, 'Строка 2: measurement_unit: длиннее 50'),
+    ('м' * 201 + ',г', 'Строка 2: name: длиннее 200'),
+    ('молоко,мл,1', 'Строка 2: ожидается колонок - 2, получено - 3'),
+), ids=('empty name', 'empty unit', 'long unit', 'long name', 'columns'))
+def test_invalid_rows(load, options, line, error):
+    with pytest.raises(CommandError, match=error):
+        load(['мука,г', line], **options)
+    assert not Ingredient.objects.exists()
+
+
+@pytest.mark.postgresql
+@pytest.mark.parametrize('options', LOADERS)
+def test_database_errors(load, options):
+    '''Ошибки БД (NUL в тексте) выводятся как ошибки команды.'''
+    with pytest.raises(CommandError):
+        load(['мука,г', 'мо\x00локо,мл'], **options)
@@ -0,0 +1,107 @@
+import io
+import os
+import time
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from recipes.images import IMAGES_DIR
+from recipes.storage import image_storage, upload_storage
+
+# Возраст старых файлов и запас времени gc_media в тестах, в секундах.
+OLD = 2 * 3600
+GRACE = 3600
+
+
+def save(storage, name, content, age=OLD):
+    '''Сохраняет файл с временем изменения age секунд назад.'''
+    name = storage.save(name, ContentFile(content))
+    modified = time.time() - age
+    os.utime(storage.path(name), (modified, modified))
+    return name
+
+
+def gc_media(**options):
+    stdout = io.StringIO()
+    call_command('gc_media', stdout=stdout, **options)
+    return stdout.getvalue()
+
+
+def test_same_content_same_name():
+    name = image_storage.save(
+        f'{IMAGES_DIR}/first.JPG', ContentFile(b'photo')
+    )
+    assert image_storage.save(
+        f'{IMAGES_DIR}/second.jpg', ContentFile(b'photo')
+    ) == name
+    assert name.startswith(IMAGES_DIR + '/') and name.endswith('.jpg')
+    assert image_storage.save(
+        f'{IMAGES_DIR}/first.jpg', ContentFile(b'other')
+    ) != name
+    directories, files = image_storage.listdir(IMAGES_DIR)
+    assert len(directories) == 2
+
+
+def test_repeated_save_refreshes_modified_time():
+    name = save(image_storage, f'{IMAGES_DIR}/photo.jpg', b'photo')
+    assert time.time() - os.path.getmtime(image_storage.path(name)) > GRACE
+    image_storage.save(f'{IMAGES_DIR}/photo.jpg', ContentFile(b'photo'))
+    assert time.time() - os.path.getmtime(image_storage.path(name)) < GRACE
+
+
+@pytest.fixture
+def files(user, make_recipe):
+    '''
+    Старые файлы: фото, копии и загрузка рецепта
+    и по одному фото и загрузке без ссылок.
+    '''
+    uploads = upload_storage()
+    image = save(image_storage, f'{IMAGES_DIR}/photo.jpg', b'photo')
+    variants = {
+        'card': {
+            'webp': save(image_storage, f'{IMAGES_DIR}/card.webp', b'webp'),
+            'jpeg': save(image_storage, f'{IMAGES_DIR}/card.jpg', b'jpeg'),
+        },
+    }
+    upload = save(uploads, 'recipes/upload.png', b'upload')
+    make_recipe(
+        user, image=image, image_variants=variants, image_upload=upload
+    )
+    return {
+        'kept': [
+            (image_storage, image),
+            (image_storage, variants['card']['webp']),
+            (image_storage, variants['card']['jpeg']),
+            (uploads, upload),
+        ],
+        'unreferenced': [
+            (image_storage, save(
+                image_storage, f'{IMAGES_DIR}/old.jpg', b'old'
+            )),
+            (uploads, save(uploads, 'recipes/old.png', b'old')),
+        ],
+    }
+
+
+def exist(files):
+    return [storage.exists(name) for storage, name in files]
+
+
+def test_referenced_files_are_kept(files):
+    output = gc_media(min_age=GRACE)
+    assert 'Фото: файлов 4, удалено без ссылок 1' in output
+    assert 'Загрузки: файлов 2, удалено без ссылок 1' in output
+    assert all(exist(files['kept']))
+    assert not any(exist(files['unreferenced']))
+
+
+def test_recent_files_are_kept(files):
+    gc_media(min_age=OLD + GRACE)
+    assert all(exist(files['kept'] + files['unreferenced']))
+
+
+def test_dry_run(files):
+    output = gc_media(min_age=GRACE, dry_run=True)
+    assert 'Фото: файлов 4, найдено без ссылок 1' in output
+    assert 'Загрузки: файлов 2, найдено без ссылок 1' in output
+    assert all(exist(files['kept'] + files['unreferenced']))
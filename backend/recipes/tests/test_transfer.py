@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from recipes.models import Ingredient, Recipe
+from recipes.transfer import export_recipes, import_recipes
+
+
+def normalized(lines):
+    '''Рецепты выгрузки; порядок тегов при загрузке не сохраняется.'''
+    recipes = [json.loads(line) for line in lines]
+    for recipe in recipes:
+        recipe['tags'].sort()
+    return recipes
+
+
+@pytest.fixture
+def exported(user, make_recipe):
+    make_recipe(user, name='Блины')
+    bare = make_recipe(user, name='Чай')
+    bare.tags.clear()
+    bare.ingredient.all().delete()
+    make_recipe(user, name='Омлет')
+    return [json.dumps(recipe) for recipe in export_recipes(chunk_size=2)]
+
+
+def test_export(exported, tags):
+    recipes = normalized(exported)
+    assert [recipe['name'] for recipe in recipes] == ['Блины', 'Чай', 'Омлет']
+    assert recipes[1]['tags'] == recipes[1]['ingredients'] == []
+    assert recipes[2]['tags'] == sorted(tag.slug for tag in tags)
+    assert {
+        ingredient['name'] for ingredient in recipes[2]['ingredients']
+    } == {'мука', 'молоко', 'яйца'}
+
+
+def test_import_round_trip(exported, user):
+    before = normalized(exported)
+    Recipe.objects.all().delete()
+    Ingredient.objects.filter(name='яйца').delete()
+    stats = import_recipes(exported, batch_size=2)
+    assert stats == {'rows': 3, 'created': 3, 'invalid': 0}
+    assert normalized(map(json.dumps, export_recipes())) == before
+    user.refresh_from_db()
+    assert user.recipes_count == 3
+    assert import_recipes(exported) == {
+        'rows': 3, 'created': 0, 'invalid': 0
+    }
+
+
+def recipe_line(name, **fields):
+    return json.dumps({
+        'name': name,
+        'tags': ['breakfast'],
+        'ingredients': [
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 10}
+        ],
+        **fields,
+    })
+
+
+def test_import_duplicate_names(user, tags):
+    '''Из одинаковых названий в одной пачке записывается первое.'''
+    stats = import_recipes([
+        recipe_line('Блины', text='первый'),
+        recipe_line('Омлет'),
+        recipe_line('Блины', text='второй'),
+    ], default_author=user)
+    assert stats == {'rows': 3, 'created': 2, 'invalid': 0}
+    assert Recipe.objects.get(name='Блины').text == 'первый'
+    user.refresh_from_db()
+    assert user.recipes_count == 2
+
+
+def test_import_skips_invalid_lines(user, tags):
+    bad = [
+        '{"name": "Чай"',
+        json.dumps(['Чай']),
+        json.dumps({'name': 'Чай', 'tags': []}),
+        recipe_line(''),
+        recipe_line('Чай', tags=[{'slug': 'breakfast'}]),
+        recipe_line('Чай', ingredients=[{'name': 'мука', 'amount': 10}]),
+        recipe_line('Чай', ingredients=[
+            {'name': 'мука', 'measurement_unit': 'г'}
+        ]),
+        recipe_line('Чай', ingredients=[
+            {'name': 'мука', 'measurement_unit': 'г', 'amount': 0}
+        ]),
+        recipe_line('Чай', ingredients=[
+            {'name': 'мука', 'measurement_unit': 'г' * 51, 'amount': 1}
+        ]),
+        recipe_line('Чай', cooking_time='5'),
+        recipe_line('Чай', pub_date='вчера'),
+        recipe_line('Чай', author=1),
+    ]
+    errors = []
+    stats = import_recipes(
+        ['', recipe_line('Блины'), *bad, recipe_line('Омлет')],
+        default_author=user, report=errors.append,
+    )
+    assert stats == {'rows': 2 + len(bad), 'created': 2, 'invalid': len(bad)}
+    assert [error.split(':')[0] for error in errors] == [
+        f'Строка {number}' for number in range(3, 3 + len(bad))
+    ]
+    assert set(Recipe.objects.values_list('name', flat=True)) == {
+        'Блины', 'Омлет'
+    }
@@ -0,0 +1,57 @@
+import io
+
+from django.core.management import call_command
+from recipes.models import Ingredient, IngredientAmount, ShoppingCart
+from recipes.units import merge_units
+
+
+def row(name, amount, unit):
+    return {'name': name, 'amount': amount, 'measurement_unit': unit}
+
+
+def test_merge_compatible_units():
+    assert list(merge_units([
+        row('молоко', 500, 'мл'),
+        row('молоко', 1, 'л'),
+        row('мука', 700, 'г'),
+        row('мука', 1, 'кг'),
+        row('мука', 2, 'стакан'),
+        row('яйца', 3, 'шт'),
+    ])) == [
+        row('молоко', 1.5, 'л'),
+        row('мука', 1.7, 'кг'),
+        row('мука', 2, 'стакан'),
+        row('яйца', 3, 'шт'),
+    ]
+
+
+def test_small_amounts_keep_base_unit():
+    assert list(merge_units([row('соль', 999, 'г')])) == [
+        row('соль', 999, 'г')
+    ]
+
+
+def test_benchmark_shopping_list(user, make_recipe):
+    '''Рецепты для замера добавляются в Корзину и откатываются.'''
+    make_recipe(user)
+    IngredientAmount.objects.create(
+        recipe=make_recipe(user),
+        ingredients=Ingredient.objects.create(
+            name='мука', measurement_unit='кг'
+        ),
+        amount=1,
+    )
+    stdout = io.StringIO()
+    call_command(
+        'benchmark_shopping_list', user=user.username, recipes=2, repeat=2,
+        stdout=stdout,
+    )
+    lines = stdout.getvalue().splitlines()
+    assert lines[0] == (
+        'Рецептов в Корзине: 2, строк ингредиентов: 7, '
+        'после группировки: 4, после сложения единиц: 3'
+    )
+    assert [line.rsplit(maxsplit=2)[0] for line in lines[1:]] == [
+        'orm sum', 'orm sum + merge', 'list + merge', 'merge only'
+    ]
+    assert not ShoppingCart.objects.exists()
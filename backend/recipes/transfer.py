@@ -0,0 +1,296 @@
+import json
+from collections import Counter, defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from .loaders import insert_ingredients
+from .models import Ingredient, IngredientAmount, Recipe, Tag, TagRecipe
+from .signals import change_counters
+
+User = get_user_model()
+
+# Сколько строк читается из серверного курсора за раз при выгрузке.
+EXPORT_CHUNK_SIZE = 2000
+# Сколько рецептов записывается в БД одной пачкой при загрузке.
+IMPORT_BATCH_SIZE = 500
+# Наибольшее значение PositiveSmallIntegerField (количество, время).
+MAX_SMALL_INTEGER = 32767
+
+
+class GroupedRows:
+    '''
+    Строки, упорядоченные по id рецепта. take(id) отдаёт строки
+    очередного рецепта, пропуская рецепты, которых нет в выгрузке;
+    id в вызовах take должны возрастать.
+    '''
+
+    def __init__(self, rows):
+        self.groups = groupby(rows, key=itemgetter(0))
+        self.current = next(self.groups, None)
+
+    def take(self, recipe_id):
+        while self.current is not None and self.current[0] < recipe_id:
+            self.current = next(self.groups, None)
+        if self.current is None or self.current[0] != recipe_id:
+            return []
+        return [row[1:] for row in self.current[1]]
+
+
+def export_recipes(chunk_size=EXPORT_CHUNK_SIZE):
+    '''
+    Выгружает рецепты вместе с ингредиентами, тегами и путём
+    к изображению. Рецепты, ингредиенты и теги читаются тремя
+    упорядоченными по id рецепта потоками и сливаются, поэтому
+    память не зависит от числа рецептов.
+    '''
+    recipes = Recipe.objects.order_by('id').values_list(
+        'id', 'author__username', 'name', 'text', 'cooking_time',
+        'pub_date', 'image',
+    ).iterator(chunk_size=chunk_size)
+    ingredients = GroupedRows(IngredientAmount.objects.order_by(
+        'recipe_id', 'id'
+    ).values_list(
+        'recipe_id', 'ingredients__name', 'ingredients__measurement_unit',
+        'amount',
+    ).iterator(chunk_size=chunk_size))
+    tags = GroupedRows(TagRecipe.objects.order_by(
+        'recipe_id', 'id'
+    ).values_list('recipe_id', 'tag__slug').iterator(chunk_size=chunk_size))
+    for pk, author, name, text, cooking_time, pub_date, image in recipes:
+        yield {
+            'name': name,
+            'author': author,
+            'text': text,
+            'cooking_time': cooking_time,
+            'pub_date': pub_date.isoformat(),
+            'image': image,
+            'tags': [slug for slug, in tags.take(pk)],
+            'ingredients': [
+                {
+                    'name': ingredient,
+                    'measurement_unit': unit,
+                    'amount': amount,
+                }
+                for ingredient, unit, amount in ingredients.take(pk)
+            ],
+        }
+
+
+def check_text(value, field, max_length=None, required=True):
+    '''Строка не длиннее max_length; обязательная - непустая.'''
+    if not isinstance(value, str):
+        raise ValueError(f'{field}: ожидается строка')
+    if required and not value.strip():
+        raise ValueError(f'{field}: ожидается непустая строка')
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f'{field}: длиннее {max_length} символов')
+
+
+def check_number(value, field):
+    '''Целое число от 1 до MAX_SMALL_INTEGER.'''
+    if (
+        not isinstance(value, int) or isinstance(value, bool)
+        or not 1 <= value <= MAX_SMALL_INTEGER
+    ):
+        raise ValueError(
+            f'{field}: ожидается целое число от 1 до {MAX_SMALL_INTEGER}'
+        )
+
+
+def check_ingredient(ingredient):
+    '''Проверяет ингредиент рецепта из выгрузки.'''
+    if not isinstance(ingredient, dict):
+        raise ValueError('ingredients: ожидается список объектов')
+    meta = Ingredient._meta
+    check_text(
+        ingredient.get('name'), 'ingredients.name',
+        meta.get_field('name').max_length,
+    )
+    check_text(
+        ingredient.get('measurement_unit'), 'ingredients.measurement_unit',
+        meta.get_field('measurement_unit').max_length,
+    )
+    check_number(ingredient.get('amount'), 'ingredients.amount')
+
+
+def check_recipe(recipe):
+    '''
+    Проверяет рецепт из выгрузки: обязательные поля name, ingredients
+    и tags, типы и длину остальных, если они есть. Ошибка - ValueError.
+    '''
+    if not isinstance(recipe, dict):
+        raise ValueError('ожидается объект')
+    meta = Recipe._meta
+    check_text(recipe.get('name'), 'name', meta.get_field('name').max_length)
+    for field in ('ingredients', 'tags'):
+        if not isinstance(recipe.get(field), list):
+            raise ValueError(f'{field}: ожидается список')
+    for ingredient in recipe['ingredients']:
+        check_ingredient(ingredient)
+    for slug in recipe['tags']:
+        check_text(slug, 'tags')
+    for field in ('author', 'text', 'image', 'pub_date'):
+        if field in recipe:
+            check_text(recipe[field], field, required=False)
+    if 'cooking_time' in recipe:
+        check_number(recipe['cooking_time'], 'cooking_time')
+    if recipe.get('pub_date') and parse_datetime(recipe['pub_date']) is None:
+        raise ValueError('pub_date: ожидается дата в формате ISO 8601')
+
+
+def read_recipes(lines, report):
+    '''
+    Разбирает JSONL. Строки с ошибками пропускаются,
+    описание ошибки с номером строки передаётся в report.
+    '''
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            recipe = json.loads(line)
+            check_recipe(recipe)
+        except ValueError as error:
+            report(f'Строка {number}: {error}')
+            continue
+        yield recipe
+
+
+def resolve_ingredients(keys):
+    '''
+    id ингредиентов по (название, единица измерения).
+    Недостающие ингредиенты добавляются в справочник.
+    '''
+    names = {name for name, unit in keys}
+
+    def stored():
+        return {
+            (name, unit): pk
+            for pk, name, unit in Ingredient.objects.filter(
+                name__in=names
+            ).order_by().values_list('pk', 'name', 'measurement_unit')
+        }
+
+    found = stored()
+    missing = keys - found.keys()
+    if not missing:
+        return found
+    with connection.cursor() as cursor:
+        insert_ingredients(cursor, missing)
+    return stored()
+
+
+def import_batch(batch, tags, default_author):
+    '''
+    Записывает пачку рецептов, возвращает число добавленных.
+    Из рецептов с одинаковым названием записывается первый.
+    '''
+    unique = {}
+    for recipe in batch:
+        unique.setdefault(recipe['name'], recipe)
+    existing = set(Recipe.objects.filter(
+        name__in=unique
+    ).values_list('name', flat=True))
+    batch = [
+        recipe for name, recipe in unique.items() if name not in existing
+    ]
+    authors = dict(User.objects.filter(
+        username__in={recipe.get('author') for recipe in batch}
+    ).values_list('username', 'pk'))
+    rows = []
+    for recipe in batch:
+        author = authors.get(recipe.get('author'), default_author)
+        if author is None:
+            continue
+        rows.append((author, recipe))
+    if not rows:
+        return 0
+    ingredients = resolve_ingredients({
+        (ingredient['name'], ingredient['measurement_unit'])
+        for author, recipe in rows for ingredient in recipe['ingredients']
+    })
+    created = Recipe.objects.bulk_create(
+        Recipe(
+            author_id=author,
+            name=recipe['name'],
+            text=recipe.get('text', ''),
+            cooking_time=recipe.get('cooking_time', 1),
+            image=recipe.get('image', ''),
+        )
+        for author, recipe in rows
+    )
+    # bulk_create на SQLite не возвращает id, а pub_date
+    # при вставке заменяется текущим временем.
+    ids = dict(Recipe.objects.filter(
+        name__in=[recipe.name for recipe in created]
+    ).values_list('name', 'pk'))
+    for recipe in created:
+        recipe.pk = ids[recipe.name]
+    dated = []
+    for recipe, (author, data) in zip(created, rows):
+        if data.get('pub_date'):
+            recipe.pub_date = parse_datetime(data['pub_date'])
+            dated.append(recipe)
+    Recipe.objects.bulk_update(dated, ['pub_date'])
+    IngredientAmount.objects.bulk_create(
+        (
+            IngredientAmount(
+                recipe_id=recipe.pk,
+                ingredients_id=ingredients[
+                    ingredient['name'], ingredient['measurement_unit']
+                ],
+                amount=ingredient['amount'],
+            )
+            for recipe, (author, data) in zip(created, rows)
+            for ingredient in data['ingredients']
+        ),
+        ignore_conflicts=True,
+    )
+    TagRecipe.objects.bulk_create(
+        TagRecipe(recipe_id=recipe.pk, tag_id=tags[slug])
+        for recipe, (author, data) in zip(created, rows)
+        for slug in set(data['tags']) if slug in tags
+    )
+    by_count = defaultdict(list)
+    for author, count in Counter(author for author, data in rows).items():
+        by_count[count].append(author)
+    for count, authors in by_count.items():
+        change_counters(Recipe, authors, count)
+    return len(created)
+
+
+def import_recipes(lines, batch_size=IMPORT_BATCH_SIZE, default_author=None,
+                   report=None):
+    '''
+    Загружает рецепты из JSONL пачками по batch_size, каждая пачка -
+    отдельная транзакция. Рецепты с уже существующими названиями
+    пропускаются, поэтому загрузку можно повторить. Авторы ищутся
+    по username, при отсутствии рецепт получает default_author
+    или пропускается. Строки с ошибками пропускаются, их описания
+    передаются в report. Файлы изображений нужно перенести отдельно.
+    '''
+    tags = dict(Tag.objects.values_list('slug', 'pk'))
+    author = default_author.pk if default_author else None
+    stats = {'rows': 0, 'created': 0, 'invalid': 0}
+
+    def invalid(message):
+        stats['rows'] += 1
+        stats['invalid'] += 1
+        if report is not None:
+            report(message)
+
+    batch = []
+    for recipe in read_recipes(lines, invalid):
+        stats['rows'] += 1
+        batch.append(recipe)
+        if len(batch) == batch_size:
+            with transaction.atomic():
+                stats['created'] += import_batch(batch, tags, author)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            stats['created'] += import_batch(batch, tags, author)
+    return stats
@@ -0,0 +1,40 @@
+from itertools import groupby
+from operator import itemgetter
+
+from .config import DISPLAY_UNITS, UNIT_CONVERSIONS
+
+
+def to_base_unit(amount, unit):
+    '''Количество в базовой единице (кг -> г, л -> мл).'''
+    base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, 1))
+    return amount * factor, base_unit
+
+
+def humanize(amount, unit):
+    '''Выводит большое количество в крупной единице: 1500 г -> 1.5 кг.'''
+    for larger_unit, factor in DISPLAY_UNITS.get(unit, ()):
+        if amount >= factor:
+            value = amount / factor
+            if value.is_integer():
+                return int(value), larger_unit
+            return round(value, 3), larger_unit
+    return amount, unit
+
+
+def merge_units(rows):
+    '''
+    Суммирует строки списка покупок с одинаковым названием
+    и совместимыми единицами ("г" и "кг", "мл" и "л").
+    Строки должны быть упорядочены по названию: за один проход
+    в памяти держатся только суммы текущего ингредиента.
+    '''
+    for name, group in groupby(rows, key=itemgetter('name')):
+        totals = {}
+        for row in group:
+            amount, unit = to_base_unit(
+                row['amount'], row['measurement_unit']
+            )
+            totals[unit] = totals.get(unit, 0) + amount
+        for unit, amount in totals.items():
+            amount, unit = humanize(amount, unit)
+            yield {'name': name, 'amount': amount, 'measurement_unit': unit}
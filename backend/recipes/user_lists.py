@@ -0,0 +1,73 @@
+from django.db import connection
+
+from .models import ShoppingCart
+from .shopping_list import apply_deltas, cart_deltas
+from .signals import COUNTERS, change_counters
+
+
+def _columns(model):
+    '''Таблица, колонка пользователя и колонка связанной записи.'''
+    quote = connection.ops.quote_name
+    meta = model._meta
+    return (
+        quote(meta.db_table),
+        quote(meta.get_field('user').column),
+        quote(meta.get_field(COUNTERS[model][0]).column),
+    )
+
+
+def add_links(model, user, pks):
+    '''
+    Добавляет рецепты в Избранное или Корзину (или авторов в подписки)
+    пользователя одним INSERT ... ON CONFLICT DO NOTHING.
+    Уже существующие записи пропускаются на уровне БД, поэтому
+    параллельные запросы не создают дублей.
+    Возвращает id действительно добавленных рецептов (авторов).
+    '''
+    pks = list(pks)
+    if not pks:
+        return []
+    table, user_column, column = _columns(model)
+    values = ', '.join(['(%s, %s)'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {column}) '
+            f'VALUES {values} ON CONFLICT DO NOTHING RETURNING {column}',
+            [value for pk in pks for value in (user.pk, pk)],
+        )
+        added = [row[0] for row in cursor.fetchall()]
+    update_dependent(model, user, added, 1)
+    return added
+
+
+def remove_links(model, user, pks):
+    '''
+    Удаляет рецепты (авторов) одним DELETE ... RETURNING.
+    Возвращает id действительно удалённых.
+    '''
+    pks = list(pks)
+    if not pks:
+        return []
+    table, user_column, column = _columns(model)
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {column} IN ({placeholders}) RETURNING {column}',
+            [user.pk, *pks],
+        )
+        removed = [row[0] for row in cursor.fetchall()]
+    update_dependent(model, user, removed, -1)
+    return removed
+
+
+def update_dependent(model, user, pks, sign):
+    '''
+    Сигналы при записи в обход ORM не отправляются,
+    поэтому счётчики и список покупок обновляются здесь.
+    '''
+    if not pks:
+        return
+    change_counters(model, pks, sign)
+    if model is ShoppingCart:
+        apply_deltas(cart_deltas([(user.pk, pk) for pk in pks], sign))
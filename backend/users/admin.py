@@ -13,6 +13,8 @@ class CustomUserAdmin(UserAdmin):
         'first_name',
         'last_name',
         'password',
+        'recipes_count',
+        'followers_count',
     )
     list_filter = (
         'username',
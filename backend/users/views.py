@@ -1,10 +1,17 @@
-from api.serializers import (PasswordSerializer, SubscribeSerializer,
-                             UserSerializer)
+from api.decorators import query_budget
+from api.pagination import (ApproximateLimitOffsetPagination,
+                            SubscriptionCursorPagination,
+                            SubscriptionPagination)
+from api.serializers import (PasswordSerializer, UserSerializer,
+                             UserSubscribeSerializer)
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from recipes.models import Subscribe
+from recipes.user_lists import add_links, remove_links
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
@@ -14,10 +21,29 @@ from .models import User
 class UserViewSet(viewsets.ModelViewSet):
     '''Вьюсет для показа юзера'''
     queryset = User.objects.all()
-    pagination_class = LimitOffsetPagination
+    pagination_class = ApproximateLimitOffsetPagination
     permission_classes = (AllowAny,)
     serializer_class = UserSerializer
     filter_backends = (filters.OrderingFilter,)
+    ordering_fields = ('username', 'recipes_count', 'followers_count')
+    lookup_value_regex = r'\d+'
+
+    @property
+    def paginator(self):
+        '''
+        Подписки листаются по ?page= и ?limit=, с параметром
+        ?pagination=cursor (или при наличии ?cursor=) - курсором
+        SubscriptionCursorPagination.
+        '''
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if self.action != 'subscriptions':
+                self._paginator = self.pagination_class()
+            elif 'cursor' in params or params.get('pagination') == 'cursor':
+                self._paginator = SubscriptionCursorPagination()
+            else:
+                self._paginator = SubscriptionPagination()
+        return self._paginator
 
     @action(
         detail=False, methods=['GET'],
@@ -61,51 +87,57 @@ class UserViewSet(viewsets.ModelViewSet):
         detail=True, methods=['POST', 'DELETE'],
         permission_classes=[IsAuthenticated]
     )
+    @transaction.atomic
     def subscribe(self, request, pk):
         '''
         Создает или удаляет подписку на пользователя.
-        Перед этим проверяет подписку на наличие в БД и на то,
-        чтобы пользователь не смог подписаться на самого себя.
+        Подписка записывается одним INSERT ... ON CONFLICT DO NOTHING,
+        удаляется одним DELETE ... RETURNING, поэтому повторные
+        и параллельные запросы не создают дублей.
+        Подписаться на самого себя нельзя.
         '''
         user = request.user
-        author = get_object_or_404(User, id=pk)
-
         if request.method == 'DELETE':
-            result = get_object_or_404(Subscribe, user=user, author=author)
-            if not result:
-                return Response(status=status.HTTP_400_BAD_REQUEST)
-            result.delete()
+            if not remove_links(Subscribe, user, [int(pk)]):
+                raise Http404
             return Response(status=status.HTTP_204_NO_CONTENT)
 
-        serializer = SubscribeSerializer
+        author = get_object_or_404(User, id=pk)
         if user == author:
             return Response(
                 {'errors': 'Нельзя подписаться на самого себя!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        if Subscribe.objects.filter(user=user, author=author):
+        if not add_links(Subscribe, user, [author.pk]):
             return Response(
                 {'errors': 'Вы уже подписаны на этого пользователя!'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        data = {'user': user.id, 'author': pk}
-        serializer = serializer(data=data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+        serializer = UserSubscribeSerializer(
+            author, context={'request': request}
+        )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(
         detail=False, methods=['GET'],
         permission_classes=[IsAuthenticated]
     )
+    @query_budget(4)
     def subscriptions(self, request):
-        '''Возвращает все подписки пользователя.'''
-        user = request.user
-        queryset = Subscribe.objects.filter(user=user)
-        pages = self.paginate_queryset(queryset)
-        serializer = SubscribeSerializer(
-            pages,
-            many=True,
-            context={'request': request}
+        '''
+        Возвращает авторов, на которых подписан пользователь,
+        от новых подписок к старым. Авторы выбираются одним запросом
+        через Subscribe (плюс подсчёт, на больших выборках - с оценкой
+        планировщика), число рецептов берётся из счётчика, рецепты
+        авторов страницы (не больше recipes_limit) - одним запросом.
+        '''
+        queryset = User.objects.filter(
+            subscribing__user=request.user
+        ).annotate(
+            subscription_id=F('subscribing__id')
+        ).order_by('-subscription_id')
+        page = self.paginate_queryset(queryset)
+        serializer = UserSubscribeSerializer(
+            page, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
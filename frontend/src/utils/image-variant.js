@@ -0,0 +1,6 @@
+const imageVariant = (image, variants = {}, variant = 'card') => {
+  const files = variants[variant]
+  return files ? files.webp : image
+}
+
+export default imageVariant